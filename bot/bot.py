@@ -1,6 +1,14 @@
 from aiogram import Bot
 
+from bot.outgoing_scheduler import OutgoingScheduler
 from settings import settings
 
 bot_token = settings.get_bot_token().get_secret_value()
 bot = Bot(bot_token)
+outgoing_scheduler = OutgoingScheduler(
+    settings.telegram_global_rate,
+    settings.telegram_chat_interval,
+    settings.telegram_group_interval,
+    settings.telegram_max_retries,
+)
+bot.session.middleware(outgoing_scheduler)
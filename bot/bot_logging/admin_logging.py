@@ -1,18 +1,24 @@
-import asyncio
 import logging
 
 from aiogram import Bot
 
+from bot.bot_logging.shipper import get_log_shipper
+
 
 class BotAdminLoggingHandler(logging.Handler):
+    """
+    Sends records to the admin chat through the shared TelegramLogShipper,
+    so logging never blocks and never floods the chat
+    """
+
     def __init__(self, bot: Bot, log_chat_id):
         super().__init__()
         self.bot = bot
         self.log_chat_id = log_chat_id
+        self.shipper = get_log_shipper(bot, log_chat_id)
 
     def emit(self, record: logging.LogRecord) -> None:
-        log_entry_ = self.format(record)
-        asyncio.create_task(self.async_emit(log_entry_))
-
-    async def async_emit(self, log_entry: str) -> None:
-        await self.bot.send_message(self.log_chat_id, log_entry)
+        try:
+            self.shipper.submit(self.format(record))
+        except Exception:
+            self.handleError(record)
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from aiogram import Bot
+
+from bot.bot_logging.admin_logging import BotAdminLoggingHandler
+from bot.bot_logging.shipper import start_log_shippers, stop_log_shippers
+
+TELEGRAM_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+TELEGRAM_DATE_FORMAT = "%y-%m-%d"
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats record as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Puts records to the queue as they are.
+    Default QueueHandler formats the record before enqueueing it to make it
+    picklable, but the queue never leaves the process, so formatting is left
+    to the listener thread and the caller only pays for the put
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+# Shared by all loggers of the process. Records logged before the logging is
+# configured wait in the queue and are written when the listener starts
+_queue = queue.SimpleQueue()
+_handler = DeferredQueueHandler(_queue)
+
+
+class LoggingConfig:
+    """
+    Handler graph shared by all loggers of the process.
+    Loggers get one DeferredQueueHandler, records are formatted and written
+    by the QueueListener thread to the Telegram sink and to JSON lines file
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        log_chat_id: int | str,
+        log_file: str | None = None,
+        levels: dict[str, str] | None = None,
+        telegram_level: int | str = logging.INFO,
+        file_max_bytes: int = 10 * 1024 * 1024,
+        file_backup_count: int = 5,
+    ):
+        """
+        :param bot: Bot sending records to the admin chat
+        :param log_chat_id: Chat ID to send logging messages
+        :param log_file: JSON lines file, records are not written to file if empty
+        :param levels: Mapping of logger name to its level name, overrides levels
+            requested by the code
+        :param telegram_level: Minimum level of records sent to the admin chat
+        :param file_max_bytes: Size of log file after which it is rotated
+        :param file_backup_count: Amount of rotated log files to keep
+        """
+        self.levels = levels or {}
+        sinks = [self.telegram_sink(bot, log_chat_id, telegram_level)]
+        if log_file:
+            sinks.append(self.file_sink(log_file, file_max_bytes, file_backup_count))
+        self.listener = QueueListener(_queue, *sinks, respect_handler_level=True)
+        self.listener.start()
+        self.running = True
+        for name, level in self.levels.items():
+            logging.getLogger(name).setLevel(level)
+
+    @staticmethod
+    def telegram_sink(
+        bot: Bot, log_chat_id: int | str, level: int | str
+    ) -> logging.Handler:
+        handler = BotAdminLoggingHandler(bot, log_chat_id)
+        handler.setFormatter(
+            logging.Formatter(TELEGRAM_FORMAT, datefmt=TELEGRAM_DATE_FORMAT)
+        )
+        handler.setLevel(level.upper() if isinstance(level, str) else level)
+        return handler
+
+    @staticmethod
+    def file_sink(path: str, max_bytes: int, backup_count: int) -> logging.Handler:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handler = RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+        handler.setFormatter(JsonLinesFormatter())
+        return handler
+
+    def stop(self) -> None:
+        """Writes records left in the queue to the sinks and stops the listener"""
+        if self.running:
+            self.running = False
+            self.listener.stop()
+
+
+_config: LoggingConfig | None = None
+
+
+def attach_logger(logger: logging.Logger, level: int | str) -> None:
+    """
+    Adds the shared queue handler to the logger once.
+    Level from settings wins over the level requested by the code,
+    loggers attached before the logging is configured get it on configuration
+
+    :param logger: Instance of Logger
+    :param level: Level requested by the code
+    :return: None
+    """
+    levels = _config.levels if _config is not None else {}
+    logger.setLevel(levels.get(logger.name, level))
+    if _handler not in logger.handlers:
+        logger.addHandler(_handler)
+
+
+def configure_logging(bot: Bot, log_chat_id: int | str, **kwargs) -> LoggingConfig:
+    """
+    Configures the sinks once per process and starts writing the queued records.
+    Called when the application starts, importing modules never starts the listener
+
+    :param bot: Bot sending records to the admin chat
+    :param log_chat_id: Chat ID to send logging messages
+    :param kwargs: Other arguments of LoggingConfig
+    :return: Configuration of the process
+    """
+    global _config
+    if _config is None:
+        _config = LoggingConfig(bot, log_chat_id, **kwargs)
+    return _config
+
+
+async def start_logging() -> None:
+    await start_log_shippers()
+
+
+async def stop_logging() -> None:
+    """
+    Drains the queue into the sinks, then sends the records left in the shippers
+
+    :return: None
+    """
+    if _config is not None:
+        await asyncio.to_thread(_config.stop)
+    await stop_log_shippers()
@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+
+from bot.outgoing_scheduler import MessagePriority, outgoing_priority
+
+MESSAGE_LIMIT = 4096
+
+
+class TelegramLogShipper:
+    """
+    Ships log records to a Telegram chat in batches.
+    Records are kept in a bounded buffer, identical records are collapsed
+    into one line with a counter, and the buffer is sent once per flush_interval
+    as few messages as possible at LOG priority, so OutgoingScheduler paces them
+    behind the replies to users and retries them on flood control.
+    Records can be submitted from any thread, even when no event loop is running
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        chat_id: int | str,
+        flush_interval: float = 2,
+        max_buffer: int = 1000,
+    ):
+        """
+        :param bot: Bot sending the messages
+        :param chat_id: Chat to send the records to
+        :param flush_interval: Seconds between flushes of the buffer
+        :param max_buffer: Maximum amount of distinct records waiting to be sent
+        """
+        self.bot = bot
+        self.chat_id = chat_id
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.sent_messages = 0
+        self.dropped_records = 0
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+        self._stopping = asyncio.Event()
+
+    def submit(self, text: str) -> None:
+        """
+        Adds formatted record to the buffer. Records are dropped when the buffer is full
+
+        :param text: Formatted record
+        :return: None
+        """
+        with self._lock:
+            if text in self._entries:
+                self._entries[text] += 1
+            elif len(self._entries) < self.max_buffer:
+                self._entries[text] = 1
+            else:
+                self._dropped += 1
+                self.dropped_records += 1
+
+    def take_lines(self) -> list[str]:
+        """
+        Empties the buffer
+
+        :return: Lines to send
+        """
+        with self._lock:
+            entries, self._entries = self._entries, OrderedDict()
+            dropped, self._dropped = self._dropped, 0
+        lines = [
+            text if count == 1 else f"{text} [repeated {count} times]"
+            for text, count in entries.items()
+        ]
+        if dropped:
+            lines.append(f"{dropped} log records were dropped, the buffer was full")
+        return lines
+
+    @staticmethod
+    def split_messages(lines: list[str], limit: int = MESSAGE_LIMIT) -> list[str]:
+        """
+        Joins lines into messages that fit into the limit of Telegram.
+        Lines longer than the limit are split
+
+        :param lines: Lines to send
+        :param limit: Maximum length of one message
+        :return: Messages
+        """
+        messages = []
+        current = ""
+        for line in lines:
+            while len(line) > limit:
+                if current:
+                    messages.append(current)
+                    current = ""
+                messages.append(line[:limit])
+                line = line[limit:]
+            if current and len(current) + 1 + len(line) > limit:
+                messages.append(current)
+                current = ""
+            current = f"{current}\n{line}" if current else line
+        if current:
+            messages.append(current)
+        return messages
+
+    async def flush(self) -> None:
+        for message in self.split_messages(self.take_lines()):
+            await self.send(message)
+
+    async def send(self, text: str) -> None:
+        """
+        Sends one message. Messages rejected by Telegram are dropped
+
+        :param text: Text of the message
+        :return: None
+        """
+        try:
+            await self.bot.send_message(self.chat_id, text)
+            self.sent_messages += 1
+        except (TelegramAPIError, OSError, asyncio.TimeoutError) as error:
+            self.report_error(f"Can not send logs to Telegram: {error}")
+
+    @staticmethod
+    def report_error(message: str) -> None:
+        # Logging the error would submit it to this shipper again
+        logging.lastResort.handle(
+            logging.makeLogRecord(
+                {"msg": message, "levelno": logging.ERROR, "levelname": "ERROR"}
+            )
+        )
+
+    async def run(self) -> None:
+        """
+        Flushes the buffer every flush_interval until stopped, then flushes the rest
+
+        :return: None
+        """
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as error:
+                self.report_error(f"Can not send logs to Telegram: {error}")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._stopping.clear()
+            # Replies to users are sent before the logs
+            with outgoing_priority(MessagePriority.LOG):
+                self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """
+        Sends all buffered records and stops shipping
+
+        :return: None
+        """
+        if self._task is None:
+            await self.flush()
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+
+
+_shippers: dict[tuple[int, str], TelegramLogShipper] = {}
+_started = False
+
+
+def get_log_shipper(bot: Bot, chat_id: int | str) -> TelegramLogShipper:
+    """
+    Returns the shipper of the chat, so all loggers writing to the same chat
+    share one buffer
+
+    :param bot: Bot sending the messages
+    :param chat_id: Chat to send the records to
+    :return: Shipper of the chat
+    """
+    key = (id(bot), str(chat_id))
+    if key not in _shippers:
+        _shippers[key] = TelegramLogShipper(bot, chat_id)
+        # Loggers set up after startup ship their records as well
+        if _started:
+            _shippers[key].start()
+    return _shippers[key]
+
+
+async def start_log_shippers() -> None:
+    global _started
+    _started = True
+    for shipper in _shippers.values():
+        shipper.start()
+
+
+async def stop_log_shippers() -> None:
+    global _started
+    _started = False
+    await asyncio.gather(*(shipper.stop() for shipper in _shippers.values()))
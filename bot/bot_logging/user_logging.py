@@ -1,22 +1,72 @@
-import asyncio
 import logging
+from contextvars import ContextVar
 
-from aiogram import Bot
+USER_LOGGER_NAME = "bot.user"
 
 
-class BotUserLoggingHandler(logging.Handler):
-    def __init__(self, bot: Bot):
-        super().__init__()
-        self.bot = bot
-        self.user_chat_id = None
+class UserLogSink:
+    """
+    Messages logged for the user while one update is handled.
+    Messages are sent together when the handler returns
+    """
+
+    def __init__(self, chat_id: int | str):
+        """
+        :param chat_id: Chat of the user who sent the update
+        """
+        self.chat_id = chat_id
+        self.lines: list[str] = []
+        self.closed = False
+
+    def add(self, line: str) -> None:
+        if not self.closed:
+            self.lines.append(line)
+
+    def close(self) -> list[str]:
+        """
+        Stops accepting messages
+
+        :return: Buffered messages
+        """
+        self.closed = True
+        lines, self.lines = self.lines, []
+        return lines
+
 
-    def set_chat_id(self, user_chat_id):
-        self.user_chat_id = user_chat_id
+# Bound by UserLogMiddleware for each update, tasks and threads started by the
+# handler inherit the sink of their update
+user_log_sink: ContextVar[UserLogSink | None] = ContextVar(
+    "user_log_sink", default=None
+)
+
+
+class BotUserLoggingHandler(logging.Handler):
+    """
+    Routes records to the sink of the update being handled, so every user
+    gets only their own messages. Records logged outside of an update,
+    or after the sink was flushed, have no user to be sent to and are dropped
+    """
 
     def emit(self, record: logging.LogRecord) -> None:
-        log_entry_ = self.format(record)
-        if self.user_chat_id:
-            asyncio.create_task(self.async_emit(log_entry_))
+        sink = user_log_sink.get()
+        if sink is not None:
+            sink.add(self.format(record))
+
+
+def get_user_logger() -> logging.Logger:
+    """
+    Returns logger of messages shown to the user who sent the update.
+    Messages are buffered per update and sent by UserLogMiddleware as one message
 
-    async def async_emit(self, log_entry: str) -> None:
-        await self.bot.send_message(self.user_chat_id, log_entry)
+    :return: User logger
+    """
+    logger = logging.getLogger(USER_LOGGER_NAME)
+    if not any(
+        isinstance(handler, BotUserLoggingHandler) for handler in logger.handlers
+    ):
+        handler = BotUserLoggingHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
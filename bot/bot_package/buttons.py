@@ -11,6 +11,7 @@ class ReplyButtons:
     delete_user = KeyboardButton(text="Delete User")
     clean_table = KeyboardButton(text="Clean Table")
     check_for_plagiarism = KeyboardButton(text="Check for plagiarism")
+    broadcast = KeyboardButton(text="Broadcast")
 
     @classmethod
     def admin_markup(cls) -> ReplyKeyboardMarkup:
@@ -26,6 +27,7 @@ class ReplyButtons:
                 [cls.open_access, cls.check_for_plagiarism],
                 [cls.all_links, cls.change_email],
                 [cls.delete_user, cls.clean_table],
+                [cls.broadcast],
             ],
         )
 
@@ -0,0 +1,144 @@
+import logging
+
+from aiogram import Bot, F, Router
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import CallbackQuery, Message
+
+from bot.bot_package.buttons import inline_buttons
+from client.mongo_client.broadcast_worker import BroadcastWorker
+from client.mongo_client.broadcasts import BroadcastStore
+from client.mongo_client.models import UserDocument
+from utils.utils import setup_logger
+
+
+class BroadcastStates(StatesGroup):
+    asked_for_text = State()
+    confirming_broadcast = State()
+
+
+class BroadcastRouter(Router):
+    def __init__(
+        self,
+        bot: Bot,
+        broadcasts: BroadcastStore,
+        broadcast_worker: BroadcastWorker,
+        log_chat_id: str,
+    ):
+        """
+        Initialisation of the bot instance and the broadcast clients
+
+        :param bot: Instance of telebot
+        :param broadcasts: Store to record the broadcasts in
+        :param broadcast_worker: Worker sending the broadcasts
+        :param log_chat_id: Chat ID to send logging messages
+        """
+        super().__init__()
+        self.bot = bot
+        self.broadcasts = broadcasts
+        self.broadcast_worker = broadcast_worker
+        self.log_chat_id = log_chat_id
+        # Confirmations being handled, so a double click starts one broadcast
+        self.confirming: set[tuple[int, int]] = set()
+        self.logger = logging.getLogger(__name__)
+        setup_logger(self.logger, self.bot, self.log_chat_id)
+        self.message.register(self.handle_broadcast_button, F.text == "Broadcast")
+        self.message.register(
+            self.receive_broadcast_text, BroadcastStates.asked_for_text, F.text
+        )
+        self.callback_query.register(
+            self.start_broadcast,
+            F.data == "confirm",
+            BroadcastStates.confirming_broadcast,
+        )
+        self.callback_query.register(
+            self.deny_broadcast, F.data == "deny", BroadcastStates.confirming_broadcast
+        )
+
+    async def handle_broadcast_button(
+        self, message: Message, state: FSMContext, user_data: UserDocument | None
+    ) -> None:
+        """
+        Validates that the user is admin. Asks for the text of the broadcast
+
+        :param message: Message from user
+        :param state: Current state of user
+        :param user_data: Document of the user loaded by middleware
+        :return: None
+        """
+        await state.clear()
+        try:
+            user_role_ = user_data.get("role")
+        except AttributeError:
+            await message.answer("You are not registered user!")
+            return
+        if user_role_ == "admin":
+            await message.answer(
+                "Please send the text that will be sent to all registered users"
+            )
+            await state.set_state(BroadcastStates.asked_for_text)
+        else:
+            await message.answer("Prohibited to use admin commands")
+
+    @staticmethod
+    async def receive_broadcast_text(message: Message, state: FSMContext) -> None:
+        """
+        Shows the text of the broadcast and asks for confirmation
+
+        :param message: Message with the text of the broadcast
+        :param state: Current state of user
+        :return: None
+        """
+        await state.update_data(broadcast_text=message.text)
+        await message.answer(
+            f"The following message will be sent to all registered users:\n\n"
+            f"{message.text}",
+            reply_markup=inline_buttons.generate_markup(
+                [[inline_buttons.confirm_button, inline_buttons.deny_button]]
+            ),
+        )
+        await state.set_state(BroadcastStates.confirming_broadcast)
+
+    async def start_broadcast(self, call: CallbackQuery, state: FSMContext) -> None:
+        """
+        Records the broadcast and starts sending it.
+        The confirmation message is replaced with the summary of the broadcast
+
+        :param call: Call from markup
+        :param state: Current state of user
+        :return: None
+        """
+        confirmation = (call.message.chat.id, call.message.message_id)
+        if confirmation in self.confirming:
+            await call.answer()
+            return
+        self.confirming.add(confirmation)
+        try:
+            userdata = await state.get_data()
+            await state.clear()
+            broadcast_text = userdata.get("broadcast_text")
+            if broadcast_text is None:
+                await call.answer("The broadcast was already started or cancelled")
+                return
+            broadcast = await self.broadcasts.create(
+                broadcast_text, call.message.chat.id, call.message.message_id
+            )
+            await call.message.edit_text(self.broadcast_worker.render(broadcast))
+            self.logger.info(
+                f"Broadcast {broadcast['_id']} was started by @{call.from_user.username}"
+            )
+            self.broadcast_worker.start(broadcast)
+        finally:
+            self.confirming.discard(confirmation)
+
+    @staticmethod
+    async def deny_broadcast(call: CallbackQuery, state: FSMContext) -> None:
+        """
+        Cancels the broadcast
+
+        :param call: Call from markup
+        :param state: Current state of user
+        :return: None
+        """
+        await call.message.edit_text("You have denied the broadcast")
+        await state.clear()
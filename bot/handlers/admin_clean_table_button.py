@@ -6,8 +6,10 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
 
 from bot.bot_package.buttons import inline_buttons
-from client.google_client.client import GoogleClient, GoogleClientException
-from client.mongo_client.client import MongoUsersClient
+from client.google_client.async_client import AsyncGoogleClient
+from client.google_client.client import GoogleClientException
+from client.mongo_client.async_client import AsyncMongoUsersClient
+from client.mongo_client.models import UserDocument
 from settings import settings
 from utils.utils import setup_logger
 
@@ -20,8 +22,8 @@ class CleanTableRouter(Router):
     def __init__(
         self,
         bot: Bot,
-        mongo_client: MongoUsersClient,
-        google_client: GoogleClient,
+        mongo_client: AsyncMongoUsersClient,
+        google_client: AsyncGoogleClient,
         log_chat_id: str,
     ):
         """
@@ -41,19 +43,19 @@ class CleanTableRouter(Router):
         self.message.register(self.handle_clean_table_button, F.text == "Clean Table")
 
     async def handle_clean_table_button(
-        self, message: Message, state: FSMContext
+        self, message: Message, state: FSMContext, user_data: UserDocument | None
     ) -> None:
         """
         Validates that the user is admin. Asks to provide table to clean
 
         :param message: Message from user
         :param state: Current state of user
+        :param user_data: Document of the user loaded by middleware
         :return: None
         """
         await state.clear()
-        user_id_ = message.from_user.id
         try:
-            user_role_ = self.mongo_client.get_user_data(user_id_).get("role")
+            user_role_ = user_data.get("role")
         except AttributeError as e: #TODO wrap into module exception
             await message.answer(f"You are not registered user!")
             return
@@ -8,9 +8,13 @@ from aiogram.types import CallbackQuery, Message
 from aiogram.exceptions import TelegramAPIError
 from exceptions.exceptions import _BaseException
 
+from bot.bot_logging.user_logging import get_user_logger
 from bot.bot_package.buttons import inline_buttons
-from client.google_client.client import GoogleClient, GoogleClientException
-from client.mongo_client.client import MongoUsersClient
+from client.google_client.async_client import AsyncGoogleClient
+from client.google_client.client import GoogleClientException
+from client.mongo_client.access_jobs import REVOKE, AccessJobQueue
+from client.mongo_client.async_client import AsyncMongoUsersClient
+from client.mongo_client.models import UserDocument
 from settings import settings
 from utils.utils import setup_logger
 
@@ -30,8 +34,9 @@ class DeleteRouter(Router):
     def __init__(
         self,
         bot: Bot,
-        mongo_client: MongoUsersClient,
-        google_client: GoogleClient,
+        mongo_client: AsyncMongoUsersClient,
+        google_client: AsyncGoogleClient,
+        access_jobs: AccessJobQueue,
         log_chat_id: str,
     ):
         """
@@ -40,14 +45,17 @@ class DeleteRouter(Router):
 
         :param bot: Instance of telebot
         :param mongo_client: Instance of Mongo database
+        :param access_jobs: Queue to remove the access to documents with
         """
         super().__init__()
         self.bot = bot
         self.mongo_client = mongo_client
         self.google_client = google_client
+        self.access_jobs = access_jobs
         self.log_chat_id = log_chat_id
         self.logger = logging.getLogger(__name__)
         setup_logger(self.logger, self.bot, self.log_chat_id)
+        self.user_logger = get_user_logger()
         self.message.register(self.handle_delete_button, F.text == "Delete User")
         self.message.register(self.validate_user_name, DeleteStates.asked_for_user_name)
         self.callback_query.register(
@@ -72,23 +80,25 @@ class DeleteRouter(Router):
             self.delete_user, F.data == "confirm", DeleteStates.confirming_selection
         )
 
-    async def handle_delete_button(self, message: Message, state: FSMContext):
+    async def handle_delete_button(
+        self, message: Message, state: FSMContext, user_data: UserDocument | None
+    ):
         """
         Validates that the user is admin. Asks to provide a username to delete
 
         :param message: Message from user
         :param state: Current state of user
+        :param user_data: Document of the user loaded by middleware
         :return:
         """
         await state.clear()
-        user_id_ = message.from_user.id
         try:
-            user_role_ = self.mongo_client.get_user_data(user_id_).get("role")
+            user_role_ = user_data.get("role")
         except AttributeError as e:
             await message.answer(f"You are not registered user!")
             return
         if user_role_ == "admin":
-            userdata = self.mongo_client.get_data(
+            userdata = await self.mongo_client.get_data(
                 {}, {"username": 1, "email": 1, "_id": 0}
             )
             userdata_text = "\n\n".join(
@@ -118,7 +128,9 @@ class DeleteRouter(Router):
         :return:
         """
         user_to_delete_ = message.text.lower()
-        userdata = self.mongo_client.get_user_data(user_to_delete_, filter_="username")
+        userdata = await self.mongo_client.get_user_data(
+            user_to_delete_, filter_="username"
+        )
         if userdata:
             await state.update_data(user_id=userdata.get("_id", ""))
             await state.update_data(user_to_delete=user_to_delete_)
@@ -236,9 +248,8 @@ class DeleteRouter(Router):
 
     async def delete_user(self, call: CallbackQuery, state: FSMContext) -> None:
         """
-        Deletes user from database and removes the access from each google document.
-        Finds permission ID by provided email in each document and deletes this permission in the document.
-        Sends the information message to admin that user was deleted
+        Deletes user from database and queues removal of the access from the documents.
+        The message is edited with the result of each table when the jobs are finished
 
         :param call: Call from markup
         :param state: Current state of user
@@ -249,29 +260,34 @@ class DeleteRouter(Router):
         table_links = userdata.get("table_links")
         email = userdata.get("email")
         user_to_delete = userdata.get("user_to_delete")
-        selected_tables = []
-        if table_links:
-            for table, link in table_links.items():
-                try:
-                    #Receive permission ID for each document
-                    permission_id = self.google_client.get_permission_id(link, email)
-                except GoogleClientException as error:
-                    error_details = error.get_response()
-                    await call.message.answer(f"Error while generating permission ID: {error_details}")
-                    return
-                if permission_id:
-                    selected_tables.append(table)
-                    self.google_client.remove_access(link, permission_id)
-                else:
-                    await call.message.answer(
-                        f"Email: {email} is not present in {table} - {link}"
-                    )
-        self.mongo_client.delete_user(value=user_to_delete, filter_="username")
-        selected_tables_text = ", ".join(selected_tables)
-        if selected_tables_text:
+        file_ids, unresolved_tables = self.resolve_file_ids(table_links or {})
+        footer = ""
+        if unresolved_tables:
+            footer = f"Tables with invalid links: {', '.join(unresolved_tables)}"
+        await self.mongo_client.delete_user(value=user_to_delete, filter_="username")
+        if file_ids:
             await call.message.edit_text(
-                f"User: @{user_to_delete} was deleted from the database"
-                f" and the following tables: \n\n {selected_tables_text}"
+                f"User: @{user_to_delete} was deleted from the database.\n\n"
+                f"Removing access from the tables..."
+            )
+            await self.access_jobs.enqueue(
+                REVOKE,
+                email,
+                file_ids,
+                call.message.chat.id,
+                call.message.message_id,
+                header=f"User: @{user_to_delete} was deleted from the database.\n\n"
+                f"Tables:",
+                footer=footer,
+                labels={
+                    link: table
+                    for table, link in table_links.items()
+                    if link in file_ids
+                },
+            )
+        elif footer:
+            await call.message.edit_text(
+                f"User: @{user_to_delete} was deleted from the database.\n\n{footer}"
             )
         else:
             await call.message.edit_text(
@@ -280,9 +296,31 @@ class DeleteRouter(Router):
         try:
             await self.delete_from_group_chat(user_id, settings.web_content_chat_id, user_to_delete)
         except AdminDeleteException as error:
-            await call.message.answer(f"Can not delete user from group chat: {error}")
+            self.user_logger.error(f"Can not delete user from group chat: {error}")
         await state.clear()
 
+    def resolve_file_ids(
+        self, table_links: dict[str, str | None]
+    ) -> tuple[dict[str, str], list[str]]:
+        """
+        Extracts the IDs of the documents from the links of the tables
+
+        :param table_links: Mapping of table name to its link from settings
+        :return: Mapping of link to file ID and names of tables with invalid links
+        """
+        file_ids = {}
+        unresolved_tables = []
+        for table, link in table_links.items():
+            try:
+                file_id = self.google_client.generate_id(link)
+            except GoogleClientException:
+                file_id = None
+            if file_id:
+                file_ids[link] = file_id
+            else:
+                unresolved_tables.append(table)
+        return file_ids, unresolved_tables
+
     async def delete_from_group_chat(self, user_id: int | str, chat_id: int | str, username: str) -> None:
         """
         Bans a user from a specified chat group and handles any Telegram API errors that might occur during the process.
@@ -6,8 +6,9 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
 
 from bot.bot_package.buttons import inline_buttons, reply_buttons
-from client.google_client.client import google_client
-from client.mongo_client.client import MongoUsersClient
+from client.google_client.client import GoogleClient
+from client.mongo_client.async_client import AsyncMongoUsersClient
+from client.mongo_client.models import UserDocument
 from settings import settings
 from utils.utils import setup_logger
 from aiogram.exceptions import TelegramBadRequest
@@ -19,7 +20,7 @@ class RegistrationStates(StatesGroup):
 
 
 class RegistrationRouter(Router):
-    def __init__(self, bot: Bot, mongo_client: MongoUsersClient, log_chat_id: str):
+    def __init__(self, bot: Bot, mongo_client: AsyncMongoUsersClient, log_chat_id: str):
         """
         Initialisation of the Mongo client, bot instance to handle bot-specific
         functions that are not supported by methods of Message class.
@@ -38,7 +39,7 @@ class RegistrationRouter(Router):
         self.message.register(
             self.email_is_valid,
             RegistrationStates.awaiting_for_email,
-            F.text.func(lambda text: google_client.is_google_email(text)),
+            F.text.func(GoogleClient.is_google_email),
         )
         self.message.register(
             self.email_is_not_valid, RegistrationStates.awaiting_for_email
@@ -47,24 +48,26 @@ class RegistrationRouter(Router):
         self.callback_query.register(self.handle_deny, F.data.startswith("registration_deny_"))
         self.callback_query.register(self.handle_role, F.data.startswith("role_"))
 
-    async def cmd_start(self, message: Message, state: FSMContext):
+    async def cmd_start(
+        self, message: Message, state: FSMContext, user_data: UserDocument | None
+    ):
         """
         If there is user data in database, and he is registered - proceed with markup
         If there is user data but status is not registered or there is no data at all-send to registration
 
         :param message: Message from user
         :param state: Current state of user
+        :param user_data: Document of the user loaded by middleware
         :return: None
         """
         await state.clear()
         user_id_ = message.from_user.id
-        user_data = self.mongo_client.get_user_data(user_id_)
         if user_data and user_data.get("status") == "registered":
             role = user_data.get("role")
             markup = reply_buttons.create_initial_markup(role)
             await message.answer("Choose what you need", reply_markup=markup)
         elif user_data and user_data.get("status") != "registered":
-            self.mongo_client.delete_user(user_id_)
+            await self.mongo_client.delete_user(user_id_)
             await message.answer(
                 "Registration process created, please provide your email"
             )
@@ -111,7 +114,7 @@ class RegistrationRouter(Router):
         )
         await state.update_data(email=message.text.lower())
         user_state = await state.get_data()
-        self.mongo_client.add_user(user_id_, user_state)
+        await self.mongo_client.add_user(user_id_, user_state)
         await self.bot.send_message(
             self.log_chat_id,
             f"User with parameters:\n\n"
@@ -137,7 +140,7 @@ class RegistrationRouter(Router):
             "Please set the role to user",
             reply_markup=inline_buttons.generate_user_role(user_id_),
         )
-        self.mongo_client.update_user(user_id_, {"status": "awaiting_for_role"})
+        await self.mongo_client.update_user(user_id_, {"status": "awaiting_for_role"})
 
     async def handle_deny(self, call: CallbackQuery) -> None:
         """
@@ -148,7 +151,8 @@ class RegistrationRouter(Router):
         :return: None
         """
         user_id_ = int(call.data.split("_")[2])
-        username = self.mongo_client.get_username(user_id_)
+        user_data = await self.mongo_client.delete_user(user_id_)
+        username = user_data.get("username") if user_data else user_id_
         await call.message.edit_text(
             f"You have denied the registration for user: {username}",
             reply_markup=None
@@ -157,7 +161,6 @@ class RegistrationRouter(Router):
             user_id_, "Registration process was denied by admin @egorkapot"
         )
         self.logger.info(f"Registration for {username} was denied")
-        self.mongo_client.delete_user(user_id_)
 
     async def handle_role(self, call: CallbackQuery) -> None:
         """
@@ -168,10 +171,12 @@ class RegistrationRouter(Router):
         """
         user_id_ = int(call.data.split("_")[2])
         role_ = call.data.split("_")[1]
-        self.mongo_client.update_user(user_id_, {"role": role_, "status": "registered"})
+        user_data = await self.mongo_client.update_user(
+            user_id_, {"role": role_, "status": "registered"}
+        )
+        username = user_data.get("username") if user_data else user_id_
         await call.message.edit_text(
-            f"{self.mongo_client.get_username(user_id_)} was registered with the role - {role_}",
-            reply_markup=None
+            f"{username} was registered with the role - {role_}", reply_markup=None
         )
         await self.bot.send_message(
             user_id_,
@@ -1,17 +1,30 @@
+import asyncio
 import logging
-import re
+import time
 
 from aiogram import Bot, F, Router
+from aiogram.exceptions import TelegramAPIError
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
+from aiohttp import ClientError
 
 from bot.bot_package.buttons import inline_buttons
-from client.google_client.client import GoogleClient, GoogleClientException
-from client.mongo_client.client import MongoUsersClient
+from client.google_client.async_client import AsyncGoogleClient
+from client.google_client.client import GoogleClientException
+from client.google_client.links import LinkCollector
+from client.mongo_client.access_jobs import GRANT, AccessJobQueue
+from client.mongo_client.async_client import AsyncMongoUsersClient
+from client.mongo_client.models import UserDocument
 from settings import settings
 from utils.utils import setup_logger
 
+LINK_FILE_EXTENSIONS = (".txt", ".csv")
+# Telegram does not let bots download bigger files
+MAX_LINK_FILE_SIZE = 20 * 1024 * 1024
+# Seconds between updates of the progress message
+PROGRESS_INTERVAL = 2
+
 
 class ButtonHandlerStates(StatesGroup):
     clicked_all_links = State()
@@ -25,13 +38,15 @@ class ButtonHandlerRouter(Router):
     def __init__(
         self,
         bot: Bot,
-        mongo_client: MongoUsersClient,
-        google_client: GoogleClient,
+        mongo_client: AsyncMongoUsersClient,
+        google_client: AsyncGoogleClient,
+        access_jobs: AccessJobQueue,
         log_chat_id: str,
     ):
         super().__init__()
         self.bot = bot
         self.google_client = google_client
+        self.access_jobs = access_jobs
         self.mongo_client = mongo_client
         self.log_chat_id = log_chat_id
         self.logger = logging.getLogger(__name__)
@@ -48,6 +63,11 @@ class ButtonHandlerRouter(Router):
         self.message.register(
             self.handle_open_the_access_button, F.text == "Open the access"
         )
+        self.message.register(
+            self.open_access_from_file,
+            ButtonHandlerStates.clicked_open_access,
+            F.document,
+        )
         self.message.register(self.open_access, ButtonHandlerStates.clicked_open_access)
         self.message.register(self.change_email, F.text == "Change my email")
         self.callback_query.register(
@@ -69,18 +89,18 @@ class ButtonHandlerRouter(Router):
         )
 
     async def handle_all_links_reply_button(
-        self, message: Message, state: FSMContext
+        self, message: Message, state: FSMContext, user_data: UserDocument | None
     ) -> None:
         """
         Generates Inline Keyboard Markup depending on user role
 
         :param message: Message from user. In this case it is a click on 'All links' button
         :param state: Current state of user
+        :param user_data: Document of the user loaded by middleware
         :return: None
         """
-        user_id = message.from_user.id
         try:
-            user_role = self.mongo_client.get_user_data(user_id).get("role")
+            user_role = user_data.get("role")
             await message.answer(
                 f"Please see the list of available links",
                 reply_markup=inline_buttons.generate_all_link_markup(user_role),
@@ -102,7 +122,7 @@ class ButtonHandlerRouter(Router):
         await call.message.answer(f"Link for {table_name}: {link_to_table}")
 
     async def handle_open_the_access_button(
-        self, message: Message, state: FSMContext
+        self, message: Message, state: FSMContext, user_data: UserDocument | None
     ) -> None:
         """
         Triggers when user clicked open access function.
@@ -110,67 +130,140 @@ class ButtonHandlerRouter(Router):
 
         :param message: Message from user
         :param state: Current state of user
+        :param user_data: Document of the user loaded by middleware
         :return: None
         """
-        user_id = message.from_user.id
         try:
-            self.mongo_client.get_user_data(user_id).get("username")
+            user_data.get("username")
             await message.answer(
                 f"Please provide links to open access.\n\n"
-                f"Please note that links should be google documents"
+                f"Please note that links should be google documents.\n\n"
+                f"You can also upload .txt or .csv file with the links"
             )
             await state.set_state(ButtonHandlerStates.clicked_open_access)
         except AttributeError:
             await message.answer(f"Error while receiving your username.\n\n"
                                  f"Please check that you are registered user")
 
-    async def open_access(self, message: Message, state: FSMContext) -> None:
+    async def open_access(
+        self, message: Message, state: FSMContext, user_data: UserDocument | None
+    ) -> None:
         """
         Splits the incoming links and divide them by valid and non-valid links
-        Open the access to valid links using google client.
-        Send notification message to user mentioning non-valid links
+        Queues opening of the access to valid links and answers at once.
+        The answer is edited with the result of each link when the jobs are finished,
+        non-valid links are mentioned in the end
 
         :param message: Message from user
         :param state: Current state of user
+        :param user_data: Document of the user loaded by middleware
         :return: None
         """
-        user_id = message.from_user.id
-        links = message.text
-        list_of_links = re.split(r"[ ,\n]+", links)
-        userdata = self.mongo_client.get_user_data(user_id)
-        email = userdata.get("email")
-        valid_links = [
-            link
-            for link in list_of_links
-            if self.google_client.is_google_document(link)
-        ]
-        invalid_links = set(list_of_links) - set(valid_links)
-        self.google_client.share_access_to_document(valid_links, email)
-        valid_links_text = "\n\n".join(valid_links)
-        if not invalid_links:
-            await message.answer(
-                f"Access should be opened for the following links: {valid_links_text}"
-            )
-        else:
-            invalid_links_message = "\n\n".join(invalid_links)
-            await message.answer(
-                f"Access should be opened for the following links: {valid_links_text}\n\n"
-                f"Links that are not google documents: {invalid_links_message}"
-            )
+        collector = LinkCollector()
+        collector.feed(message.text or "")
+        collector.close()
+        reply = await message.answer("Checking the links...")
+        await self.enqueue_access(reply, collector, user_data.get("email"))
         await state.clear()
 
-    async def change_email(self, message: Message, state: FSMContext) -> None:
+    async def open_access_from_file(
+        self, message: Message, state: FSMContext, user_data: UserDocument | None
+    ) -> None:
+        """
+        Reads links from uploaded .txt or .csv file.
+        The file is downloaded in chunks and parsed while it is downloaded,
+        the answer shows how many links were read so far
+
+        :param message: Message with the document
+        :param state: Current state of user
+        :param user_data: Document of the user loaded by middleware
+        :return: None
+        """
+        document = message.document
+        file_name = (document.file_name or "").lower()
+        if not file_name.endswith(LINK_FILE_EXTENSIONS):
+            await message.answer("Please upload .txt or .csv file with the links")
+            return
+        if document.file_size and document.file_size > MAX_LINK_FILE_SIZE:
+            await message.answer("The file is too big, maximum size is 20 MB")
+            return
+        reply = await message.answer("Reading the file...")
+        collector = LinkCollector()
+        try:
+            file = await self.bot.get_file(document.file_id)
+            last_progress_at = time.monotonic()
+            async for chunk in self.bot.session.stream_content(
+                self.bot.session.api.file_url(self.bot.token, file.file_path)
+            ):
+                collector.feed_bytes(chunk)
+                if time.monotonic() - last_progress_at > PROGRESS_INTERVAL:
+                    last_progress_at = time.monotonic()
+                    await reply.edit_text(
+                        f"Reading the file... {collector.total} links read"
+                    )
+        except (ClientError, TelegramAPIError, asyncio.TimeoutError) as error:
+            self.logger.warning(f"Can not download file with links: {error}")
+            await reply.edit_text("Can not read the file, please try again later")
+            await state.clear()
+            return
+        collector.close()
+        await self.enqueue_access(reply, collector, user_data.get("email"))
+        await state.clear()
+
+    async def enqueue_access(
+        self, reply: Message, collector: LinkCollector, email: str
+    ) -> None:
+        """
+        Queues opening of the access to collected documents.
+        The reply is edited with the result when the jobs are finished
+
+        :param reply: Message of the bot to report to
+        :param collector: Links read from the user
+        :param email: Email to open the access
+        :return: None
+        """
+        footer = ""
+        if collector.invalid_count:
+            invalid_links_message = "\n\n".join(collector.invalid)
+            not_shown = collector.invalid_count - len(collector.invalid)
+            if not_shown:
+                invalid_links_message += f"\n\n... and {not_shown} more"
+            footer = f"Links that are not google documents: {invalid_links_message}"
+        if collector.duplicates:
+            footer += f"\n\nDuplicate links skipped: {collector.duplicates}"
+        footer = footer.strip()
+        links = collector.links()
+        if not links:
+            await reply.edit_text(footer or "No links were provided")
+            return
+        await reply.edit_text(
+            f"Opening the access to {len(links)} links, "
+            f"this message will be updated when it is done"
+        )
+        await self.access_jobs.enqueue(
+            GRANT,
+            email,
+            links,
+            reply.chat.id,
+            reply.message_id,
+            header="Access to the links:",
+            footer=footer,
+        )
+
+    async def change_email(
+        self, message: Message, state: FSMContext, user_data: UserDocument | None
+    ) -> None:
         """
         Triggers when user click Change my email button.
         Generate markup to user to accept or decline change of email
         :param message: Message from user
         :param state: Current state of user
+        :param user_data: Document of the user loaded by middleware
         :return: None
         """
         user_id = message.from_user.id
         try:
-            userdata = self.mongo_client.get_user_data(user_id)
-            email = userdata.get("email")
+            email = user_data.get("email")
             await message.answer(
                 f"Your current email is: {email}\n\n"
                 f"Are you sure you want to change it?",
@@ -219,7 +312,7 @@ class ButtonHandlerRouter(Router):
         user_id = message.from_user.id
         new_email = message.text
         if self.google_client.is_google_email(new_email):
-            self.mongo_client.update_user(user_id, {"email": new_email})
+            await self.mongo_client.update_user(user_id, {"email": new_email})
             await message.answer(f"Your email was changed to {new_email}")
             await state.clear()
         else:
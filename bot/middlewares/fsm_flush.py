@@ -0,0 +1,30 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.types import TelegramObject
+
+from client.mongo_client.fsm_storage import MongoStorage
+
+
+class StorageFlushMiddleware(BaseMiddleware):
+    """
+    Outer middleware that writes all FSM changes made by the handler at once.
+    Should be registered after the dispatcher is created, so it runs inside the FSM middleware
+    """
+
+    def __init__(self, storage: MongoStorage):
+        self.storage = storage
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        try:
+            return await handler(event, data)
+        finally:
+            state: FSMContext | None = data.get("state")
+            if state is not None:
+                await self.storage.flush(state.key)
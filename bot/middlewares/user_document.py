@@ -0,0 +1,30 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+
+from client.mongo_client.async_client import AsyncMongoUsersClient
+
+
+class UserDocumentMiddleware(BaseMiddleware):
+    """
+    Outer middleware that loads the document of the user who sent the update exactly once.
+    The document is passed to handlers as `user_data` argument of UserDocument type,
+    or None if the user is not present in the database
+    """
+
+    def __init__(self, mongo_client: AsyncMongoUsersClient):
+        self.mongo_client = mongo_client
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        user: User | None = data.get("event_from_user")
+        if user is not None:
+            data["user_data"] = await self.mongo_client.get_user_data(user.id)
+        else:
+            data["user_data"] = None
+        return await handler(event, data)
@@ -0,0 +1,61 @@
+import logging
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import Chat, TelegramObject, User
+
+from bot.bot_logging.shipper import TelegramLogShipper
+from bot.bot_logging.user_logging import UserLogSink, user_log_sink
+from utils.utils import setup_logger
+
+
+class UserLogMiddleware(BaseMiddleware):
+    """
+    Outer middleware that binds UserLogSink of the chat the update came from.
+    Messages logged for the user by the handler are sent as one message
+    after the handler returns, even if it failed
+    """
+
+    def __init__(self, bot: Bot, log_chat_id: int | str):
+        """
+        :param bot: Bot sending the messages
+        :param log_chat_id: Chat ID to send logging messages
+        """
+        self.bot = bot
+        self.logger = logging.getLogger(__name__)
+        setup_logger(self.logger, bot, log_chat_id, logging.WARNING)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        chat: Chat | None = data.get("event_chat")
+        user: User | None = data.get("event_from_user")
+        chat_id = chat.id if chat is not None else user.id if user is not None else None
+        if chat_id is None:
+            return await handler(event, data)
+        sink = UserLogSink(chat_id)
+        token = user_log_sink.set(sink)
+        try:
+            return await handler(event, data)
+        finally:
+            user_log_sink.reset(token)
+            await self.flush(sink)
+
+    async def flush(self, sink: UserLogSink) -> None:
+        """
+        Sends buffered messages of the update
+
+        :param sink: Sink of the update
+        :return: None
+        """
+        lines = sink.close()
+        for text in TelegramLogShipper.split_messages(lines):
+            try:
+                await self.bot.send_message(sink.chat_id, text)
+            except TelegramAPIError as error:
+                self.logger.warning(f"Can not notify chat {sink.chat_id}: {error}")
+                return
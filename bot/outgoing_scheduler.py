@@ -0,0 +1,367 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import TYPE_CHECKING, Iterator
+
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    CopyMessage,
+    EditMessageCaption,
+    EditMessageLiveLocation,
+    EditMessageMedia,
+    EditMessageReplyMarkup,
+    EditMessageText,
+    ForwardMessage,
+    Response,
+    SendAnimation,
+    SendAudio,
+    SendContact,
+    SendDice,
+    SendDocument,
+    SendGame,
+    SendInvoice,
+    SendLocation,
+    SendMediaGroup,
+    SendMessage,
+    SendPhoto,
+    SendPoll,
+    SendSticker,
+    SendVenue,
+    SendVideo,
+    SendVideoNote,
+    SendVoice,
+    TelegramMethod,
+)
+from aiogram.methods.base import TelegramType
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+# Methods delivering a new message, they wait in the queue of their chat
+SEND_METHODS = frozenset(
+    {
+        CopyMessage,
+        ForwardMessage,
+        SendAnimation,
+        SendAudio,
+        SendContact,
+        SendDice,
+        SendDocument,
+        SendGame,
+        SendInvoice,
+        SendLocation,
+        SendMediaGroup,
+        SendMessage,
+        SendPhoto,
+        SendPoll,
+        SendSticker,
+        SendVenue,
+        SendVideo,
+        SendVideoNote,
+        SendVoice,
+    }
+)
+# Edits answer the user right away, so they only take a token of the bot.
+# Other methods, e.g. chat actions and answers to callbacks, are not paced
+EDIT_METHODS = frozenset(
+    {
+        EditMessageCaption,
+        EditMessageLiveLocation,
+        EditMessageMedia,
+        EditMessageReplyMarkup,
+        EditMessageText,
+    }
+)
+
+
+class MessagePriority(IntEnum):
+    INTERACTIVE = 0
+    LOG = 1
+    BROADCAST = 2
+
+
+# Priority of messages sent in the current context.
+# Messages sent while handling an update are interactive unless marked otherwise
+message_priority: ContextVar[MessagePriority] = ContextVar(
+    "message_priority", default=MessagePriority.INTERACTIVE
+)
+
+
+@contextmanager
+def outgoing_priority(priority: MessagePriority) -> Iterator[None]:
+    """Marks messages sent inside the block, and by tasks created in it"""
+    token = message_priority.set(priority)
+    try:
+        yield
+    finally:
+        message_priority.reset(token)
+
+
+class PriorityWaiters:
+    """Waiters woken one by one, the most important and the oldest first"""
+
+    def __init__(self):
+        self.heap: list[tuple[int, int, asyncio.Future]] = []
+        self.sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def push(self, priority: MessagePriority) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.heap, (priority, next(self.sequence), future))
+        return future
+
+    def wake_next(self) -> bool:
+        while self.heap:
+            _, _, future = heapq.heappop(self.heap)
+            if not future.done():
+                future.set_result(None)
+                return True
+        return False
+
+    def depth(self) -> dict[str, int]:
+        depth = {priority.name.lower(): 0 for priority in MessagePriority}
+        for priority, _, future in self.heap:
+            if not future.done():
+                depth[MessagePriority(priority).name.lower()] += 1
+        return depth
+
+
+@dataclass
+class ChatQueue:
+    """Messages of one chat, sent one at a time with the interval of the chat"""
+
+    interval: float
+    busy: bool = False
+    next_send_at: float = 0.0
+    waiters: PriorityWaiters = field(default_factory=PriorityWaiters)
+
+
+class GlobalBucket:
+    """
+    Async token bucket limiting messages of the whole bot.
+    Only the first waiter by priority may take a token, so interactive
+    replies overtake logs and broadcasts that wait for the same token
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        :param rate: Messages per second
+        :param capacity: Maximum burst of messages
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.waiters: list[tuple[int, int, asyncio.Event]] = []
+        self.sequence = itertools.count()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, priority: MessagePriority) -> None:
+        entry = (priority, next(self.sequence), asyncio.Event())
+        heapq.heappush(self.waiters, entry)
+        try:
+            while True:
+                self._refill()
+                pause = self.paused_until - time.monotonic()
+                if self.waiters[0] is entry and self.tokens >= 1 and pause <= 0:
+                    heapq.heappop(self.waiters)
+                    self.tokens -= 1
+                    return
+                entry[2].clear()
+                timeout = None
+                if self.waiters[0] is entry:
+                    timeout = max(pause, (1 - self.tokens) / self.rate, 0.001)
+                try:
+                    await asyncio.wait_for(entry[2].wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            if entry in self.waiters:
+                self.waiters.remove(entry)
+                heapq.heapify(self.waiters)
+            raise
+        finally:
+            if self.waiters:
+                self.waiters[0][2].set()
+
+    def depth(self) -> dict[str, int]:
+        depth = {priority.name.lower(): 0 for priority in MessagePriority}
+        for priority, _, _ in self.waiters:
+            depth[MessagePriority(priority).name.lower()] += 1
+        return depth
+
+
+class OutgoingScheduler(BaseRequestMiddleware):
+    """
+    Session middleware that paces all messages sent by the bot.
+    New messages wait in the queue of their chat, so a chat gets at most one message
+    per chat_interval, and then for a token of the global bucket.
+    Edits of messages wait only for the token.
+    Interactive replies go first, logs and broadcasts wait for them.
+    Calls rejected with retry_after pause their chat and are sent again
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30,
+        chat_interval: float = 1,
+        group_interval: float = 3,
+        max_retries: int = 3,
+        max_idle_chats: int = 10000,
+    ):
+        """
+        :param global_rate: Messages per second sent by the bot
+        :param chat_interval: Seconds between messages to one private chat
+        :param group_interval: Seconds between messages to one group or channel
+        :param max_retries: Retries of a call rejected with retry_after
+        :param max_idle_chats: Amount of idle chats after which they are forgotten
+        """
+        self.bucket = GlobalBucket(global_rate, global_rate)
+        self.chat_interval = chat_interval
+        self.group_interval = group_interval
+        self.max_retries = max_retries
+        self.max_idle_chats = max_idle_chats
+        self.chats: dict[str, ChatQueue] = {}
+        self.sent = 0
+        self.retried = 0
+        self.total_delay = 0.0
+        self.max_delay = 0.0
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: "Bot",
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if type(method) in SEND_METHODS:
+            chat_id = method.chat_id
+        elif type(method) in EDIT_METHODS:
+            chat_id = None
+        else:
+            return await make_request(bot, method)
+        priority = message_priority.get()
+        started_at = time.monotonic()
+        chat = await self.acquire_chat(chat_id, priority)
+        try:
+            for attempt in range(self.max_retries + 1):
+                await self.bucket.acquire(priority)
+                if attempt == 0:
+                    self.record_delay(time.monotonic() - started_at)
+                try:
+                    return await make_request(bot, method)
+                except TelegramRetryAfter as error:
+                    if attempt == self.max_retries:
+                        raise
+                    self.retried += 1
+                    if chat is None:
+                        self.bucket.pause(error.retry_after)
+                    else:
+                        # The chat is kept, so its messages stay in order
+                        await asyncio.sleep(error.retry_after)
+        finally:
+            if chat is not None:
+                self.release_chat(chat)
+
+    def chat_queue(self, chat_id: int | str) -> ChatQueue:
+        key = str(chat_id)
+        chat = self.chats.get(key)
+        if chat is None:
+            if len(self.chats) >= self.max_idle_chats:
+                self.forget_idle_chats()
+            # Groups and channels have negative IDs or are addressed by username
+            is_private = str(chat_id).isdigit()
+            chat = ChatQueue(self.chat_interval if is_private else self.group_interval)
+            self.chats[key] = chat
+        return chat
+
+    def forget_idle_chats(self) -> None:
+        now = time.monotonic()
+        self.chats = {
+            key: chat
+            for key, chat in self.chats.items()
+            if chat.busy or chat.waiters or chat.next_send_at > now
+        }
+
+    async def acquire_chat(
+        self, chat_id: int | str | None, priority: MessagePriority
+    ) -> ChatQueue | None:
+        """
+        Waits for the turn of the message in the queue of its chat
+
+        :param chat_id: Chat of the message, None for edits
+        :param priority: Priority of the message
+        :return: Queue of the chat owned by the caller until it is released
+        """
+        if chat_id is None:
+            return None
+        chat = self.chat_queue(chat_id)
+        if chat.busy:
+            future = chat.waiters.push(priority)
+            try:
+                await future
+            except asyncio.CancelledError:
+                # The turn could have been passed to this waiter already
+                if future.done() and not future.cancelled():
+                    self.release_chat(chat)
+                raise
+        chat.busy = True
+        try:
+            delay = chat.next_send_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except BaseException:
+            self.release_chat(chat)
+            raise
+        return chat
+
+    def release_chat(self, chat: ChatQueue) -> None:
+        """
+        Passes the turn to the next message of the chat
+
+        :param chat: Queue owned by the caller
+        :return: None
+        """
+        chat.next_send_at = time.monotonic() + chat.interval
+        if not chat.waiters.wake_next():
+            chat.busy = False
+
+    def record_delay(self, delay: float) -> None:
+        self.sent += 1
+        self.total_delay += delay
+        self.max_delay = max(self.max_delay, delay)
+
+    def metrics(self) -> dict:
+        queue_depth = self.bucket.depth()
+        for chat in self.chats.values():
+            for priority, count in chat.waiters.depth().items():
+                queue_depth[priority] += count
+        return {
+            "sent": self.sent,
+            "retried": self.retried,
+            "queue_depth": queue_depth,
+            "busy_chats": sum(chat.busy for chat in self.chats.values()),
+            "tokens": round(self.bucket.tokens, 2),
+            "average_delay": round(self.total_delay / self.sent, 3) if self.sent else 0,
+            "max_delay": round(self.max_delay, 3),
+        }
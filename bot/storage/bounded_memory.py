@@ -0,0 +1,102 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+
+@dataclass
+class BoundedMemoryRecord:
+    data: dict[str, Any] = field(default_factory=dict)
+    state: str | None = None
+    expires_at: float = 0.0
+
+
+class BoundedMemoryStorage(BaseStorage):
+    """
+    In-memory FSM storage that keeps at most max_entries records
+    and forgets the ones that were idle for longer than ttl seconds.
+
+    Records are kept in access order. As ttl is the same for every record,
+    this order is also the order of expiration, so expired and least recently used
+    records are always at the front and are removed without scanning the storage
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 86400):
+        """
+        :param max_entries: Maximum amount of records to keep
+        :param ttl: Seconds of inactivity after which the record expires
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.storage: OrderedDict[StorageKey, BoundedMemoryRecord] = OrderedDict()
+        self.expired_count = 0
+        self.evicted_count = 0
+
+    def __len__(self) -> int:
+        return len(self.storage)
+
+    def stats(self) -> dict:
+        """
+        Returns the counters of the storage
+
+        :return: Dictionary with current size, expired and evicted records
+        """
+        return {
+            "size": len(self.storage),
+            "expired": self.expired_count,
+            "evicted": self.evicted_count,
+        }
+
+    def _expire(self, now: float) -> None:
+        while self.storage:
+            key, record = next(iter(self.storage.items()))
+            if record.expires_at > now:
+                break
+            del self.storage[key]
+            self.expired_count += 1
+
+    def _get(self, key: StorageKey) -> BoundedMemoryRecord | None:
+        now = time.monotonic()
+        self._expire(now)
+        record = self.storage.get(key)
+        if record is not None:
+            record.expires_at = now + self.ttl
+            self.storage.move_to_end(key)
+        return record
+
+    def _set(self, key: StorageKey, state: str | None, data: dict[str, Any]) -> None:
+        if state is None and not data:
+            # Cleared records are not kept at all
+            self.storage.pop(key, None)
+            return
+        now = time.monotonic()
+        self._expire(now)
+        self.storage[key] = BoundedMemoryRecord(data, state, now + self.ttl)
+        self.storage.move_to_end(key)
+        while len(self.storage) > self.max_entries:
+            self.storage.popitem(last=False)
+            self.evicted_count += 1
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = self._get(key)
+        data = record.data if record is not None else {}
+        self._set(key, state.state if isinstance(state, State) else state, data)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        record = self._get(key)
+        return record.state if record is not None else None
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        record = self._get(key)
+        state = record.state if record is not None else None
+        self._set(key, state, data.copy())
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        record = self._get(key)
+        return record.data.copy() if record is not None else {}
+
+    async def close(self) -> None:
+        self.storage.clear()
@@ -0,0 +1,293 @@
+import asyncio
+import logging
+from collections import defaultdict
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+
+from client.google_client.async_client import AsyncGoogleClient
+from client.google_client.models import RevokeStatus
+from client.mongo_client.access_jobs import GRANT, AccessJobQueue
+from utils.utils import setup_logger
+
+MESSAGE_LIMIT = 4096
+
+
+class AccessJobWorker:
+    """
+    Pool of workers draining AccessJobQueue through Google client.
+    Leased jobs of the same action and email are sent together, so a burst
+    of links becomes a few batch requests. Jobs failed because the call
+    to Google did not complete are retried with exponential backoff.
+    When all jobs of a batch are finished the message of the batch is edited
+    with the result of each link, until then big batches show their progress
+    """
+
+    def __init__(
+        self,
+        queue: AccessJobQueue,
+        google_client: AsyncGoogleClient,
+        bot_: Bot,
+        chat_id: str | int,
+        concurrency: int = 4,
+        batch_size: int = 100,
+        lease_seconds: float = 300,
+        max_attempts: int = 5,
+        poll_interval: float = 5,
+        progress_interval: float = 5,
+    ):
+        """
+        :param queue: Queue to take the jobs from
+        :param google_client: Client to open and remove the access with
+        :param concurrency: Amount of workers
+        :param batch_size: Maximum amount of jobs leased by worker at once
+        :param lease_seconds: Seconds the leased jobs belong to the worker
+        :param max_attempts: Attempts after which the job is failed
+        :param poll_interval: Seconds between checks of the queue when it is empty
+        :param progress_interval: Seconds between progress updates of big batches
+        """
+        self.queue = queue
+        self.google_client = google_client
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.progress_interval = progress_interval
+        self.bot = bot_
+        self.chat_id = chat_id
+        self.batch_locks: dict[str, asyncio.Lock] = {}
+        self.batch_lock_users: dict[str, int] = defaultdict(int)
+        self.workers: list[asyncio.Task] = []
+        self.logger = logging.getLogger(__name__)
+        setup_logger(self.logger, self.bot, self.chat_id, logging.WARNING)
+
+    async def run(self) -> None:
+        """
+        Reports batches finished before restart and starts the workers
+
+        :return: None
+        """
+        for batch_id in await self.queue.unnotified_batch_ids():
+            await self.notify(batch_id)
+        self.workers = [
+            asyncio.create_task(self.work()) for _ in range(self.concurrency)
+        ]
+        await asyncio.gather(*self.workers)
+
+    async def stop(self) -> None:
+        """
+        Cancels the workers and waits for them.
+        Jobs of their leases are leased again when the leases expire
+
+        :return: None
+        """
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def work(self) -> None:
+        new_jobs = self.queue.subscribe()
+        try:
+            while True:
+                try:
+                    # Cleared before leasing, so jobs enqueued after an empty lease
+                    # wake the worker up
+                    new_jobs.clear()
+                    jobs = await self.queue.lease(self.batch_size, self.lease_seconds)
+                    if not jobs:
+                        await self.wait_for_jobs(new_jobs)
+                        continue
+                    heartbeat = asyncio.create_task(
+                        self.keep_lease(jobs[0]["lease_id"])
+                    )
+                    try:
+                        await self.process(jobs)
+                    finally:
+                        heartbeat.cancel()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as error:
+                    self.logger.error(f"Access job worker failed: {error}")
+                    await asyncio.sleep(self.poll_interval)
+        finally:
+            self.queue.unsubscribe(new_jobs)
+
+    async def keep_lease(self, lease_id: str) -> None:
+        """
+        Extends the lease while its jobs are processed, as calls to Google
+        can wait for the quota longer than lease_seconds
+
+        :param lease_id: ID of the lease
+        :return: None
+        """
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self.queue.extend_lease(lease_id, self.lease_seconds)
+            except Exception as error:
+                self.logger.warning(f"Can not extend lease {lease_id}: {error}")
+
+    async def wait_for_jobs(self, new_jobs: asyncio.Event) -> None:
+        try:
+            await asyncio.wait_for(new_jobs.wait(), self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+
+    async def process(self, jobs: list[dict]) -> None:
+        """
+        Executes leased jobs grouped by action and email, then notifies their batches
+
+        :param jobs: Leased jobs
+        :return: None
+        """
+        groups = defaultdict(list)
+        batch_ids = set()
+        for job in jobs:
+            groups[(job["action"], job["email"])].append(job)
+        for (action, email), group in groups.items():
+            links = [job["link"] for job in group]
+            try:
+                results = await self.execute(action, links, email)
+            except Exception as error:
+                for job in group:
+                    batch_ids.update(await self.retry_or_fail(job, str(error)))
+                continue
+            for job in group:
+                succeeded, result = results[job["link"]]
+                if succeeded:
+                    batch_ids.update(await self.queue.complete(job, result))
+                else:
+                    batch_ids.update(await self.queue.fail(job, result))
+        for batch_id in batch_ids:
+            await self.notify(batch_id)
+
+    async def execute(
+        self, action: str, links: list[str], email: str
+    ) -> dict[str, tuple[bool, str]]:
+        """
+        Opens or removes the access to the documents.
+        Errors of single documents are final, as they were already retried by the client
+
+        :param action: GRANT or REVOKE
+        :param links: Links to the documents
+        :param email: Email to open or remove the access of
+        :return: Mapping of link to success and the text of the result
+        """
+        if action == GRANT:
+            results = await self.google_client.share_access_to_document(links, email)
+            return {
+                result.link: (result.ok, "access opened")
+                if result.ok
+                else (False, f"error: {result.error}")
+                for result in results
+            }
+        results = await self.google_client.revoke_access(links, email)
+        texts = {
+            RevokeStatus.REMOVED: "access removed",
+            RevokeStatus.NOT_PRESENT: f"{email} is not present",
+        }
+        return {
+            result.link: (True, texts[result.status])
+            if result.ok
+            else (False, f"error: {result.error}")
+            for result in results
+        }
+
+    async def retry_or_fail(self, job: dict, error: str) -> list[str]:
+        """
+        Returns the job to the queue with exponential backoff
+        or fails it if there are no attempts left
+
+        :param job: Leased job
+        :param error: Error of the attempt
+        :return: IDs of the batches to notify
+        """
+        if job.get("attempts", 0) >= self.max_attempts:
+            self.logger.error(f"Access job {job['_id']} failed: {error}")
+            return await self.queue.fail(job, f"error: {error}")
+        delay = min(300, 5 * 2 ** (job.get("attempts", 1) - 1))
+        self.logger.warning(f"Access job {job['_id']} will be retried: {error}")
+        await self.queue.retry(job, error, delay)
+        return []
+
+    async def notify(self, batch_id: str) -> None:
+        """
+        Edits the message of the batch if all its jobs are finished.
+        Edits of one batch are made one at a time, so a progress edit
+        never lands after the result
+
+        :param batch_id: ID of the batch
+        :return: None
+        """
+        lock = self.batch_locks.setdefault(batch_id, asyncio.Lock())
+        self.batch_lock_users[batch_id] += 1
+        try:
+            async with lock:
+                await self.edit_batch(batch_id)
+        finally:
+            self.batch_lock_users[batch_id] -= 1
+            if not self.batch_lock_users[batch_id]:
+                del self.batch_lock_users[batch_id]
+                del self.batch_locks[batch_id]
+
+    async def edit_batch(self, batch_id: str) -> None:
+        claimed = await self.queue.claim_finished_batch(batch_id)
+        if claimed is None:
+            await self.report_progress(batch_id)
+            return
+        batch, jobs = claimed
+        try:
+            await self.bot.edit_message_text(
+                self.render(batch, jobs),
+                chat_id=batch["chat_id"],
+                message_id=batch["message_id"],
+            )
+        except TelegramAPIError as error:
+            self.logger.warning(f"Can not report access batch {batch_id}: {error}")
+
+    async def report_progress(self, batch_id: str) -> None:
+        """
+        Shows how many links of a big batch are processed
+
+        :param batch_id: ID of unfinished batch
+        :return: None
+        """
+        progress = await self.queue.claim_progress(batch_id, self.progress_interval)
+        if progress is None:
+            return
+        batch, finished = progress
+        try:
+            await self.bot.edit_message_text(
+                f"{batch['header']}\n\n"
+                f"Processed {finished} of {len(batch['job_ids'])} links...",
+                chat_id=batch["chat_id"],
+                message_id=batch["message_id"],
+            )
+        except TelegramAPIError as error:
+            self.logger.warning(f"Can not report progress of batch {batch_id}: {error}")
+
+    @staticmethod
+    def render(batch: dict, jobs: list[dict]) -> str:
+        """
+        Builds the text of the batch result that fits into one message
+
+        :param batch: Finished batch
+        :param jobs: Jobs of the batch
+        :return: Text of the message
+        """
+        labels = batch.get("labels", {})
+        lines = [
+            f"{labels.get(job['link'], job['link'])} - {job.get('result')}"
+            for job in jobs
+        ]
+        footer = f"\n\n{batch['footer']}" if batch.get("footer") else ""
+        text = batch["header"]
+        for index, line in enumerate(lines):
+            rest = f"\n\n... and {len(lines) - index} more"
+            if len(text) + len(line) + 2 + len(rest) + len(footer) > MESSAGE_LIMIT:
+                text += rest
+                break
+            text += f"\n\n{line}"
+        return text + footer
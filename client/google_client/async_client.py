@@ -0,0 +1,126 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable
+
+from client.google_client.client import GoogleClient
+from client.google_client.models import RevokeResult, ShareResult
+from client.google_client.quota import background_priority
+
+
+class AsyncGoogleClient:
+    """
+    Asyncio facade over GoogleClient.
+    Blocking calls of googleapiclient run on a dedicated bounded thread pool,
+    so the event loop stays responsive while Drive or Sheets are slow.
+    Every worker thread uses its own service objects of the wrapped client
+    """
+
+    def __init__(self, client: GoogleClient, max_workers: int = 4):
+        """
+        :param client: Google client to run the calls of
+        :param max_workers: Maximum amount of calls running at the same time
+        """
+        self.client = client
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="google_client"
+        )
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Runs blocking function on the thread pool of the client.
+        The function runs in a copy of the current context, so the priority
+        of the caller is visible to the quota scheduler
+
+        :param func: Function to run
+        :return: Result of the function
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(context.run, func, *args, **kwargs)
+        )
+
+    async def run_background(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Runs blocking function as background work, which yields the quota
+        to the requests made on behalf of users
+
+        :param func: Function to run
+        :return: Result of the function
+        """
+        with background_priority():
+            return await self.run(func, *args, **kwargs)
+
+    async def connect(self) -> None:
+        """Loads credentials and builds services on one of the worker threads"""
+        await self.run(self.client.connect)
+
+    async def share_access_to_document(
+        self, links: list[str], email: str
+    ) -> list[ShareResult]:
+        return await self.run(self.client.share_access_to_document, links, email)
+
+    async def get_permission_id(self, link: str, email: str) -> str | None:
+        return await self.run(self.client.get_permission_id, link, email)
+
+    async def remove_access(self, link: str, permission_id: str) -> None:
+        await self.run(self.client.remove_access, link, permission_id)
+
+    async def revoke_access(self, links: list[str], email: str) -> list[RevokeResult]:
+        return await self.run(self.client.revoke_access, links, email)
+
+    async def clean_spreadsheet(
+        self, link: str, excluded_sheets: Iterable[str] | None = None
+    ) -> list[dict]:
+        return await self.run_background(
+            self.client.clean_spreadsheet, link, excluded_sheets
+        )
+
+    async def get_start_page_token(self) -> str:
+        return await self.run_background(self.client.get_start_page_token)
+
+    async def list_changes(self, page_token: str) -> tuple[list[dict], str]:
+        return await self.run_background(self.client.list_changes, page_token)
+
+    async def reconcile_permissions(self) -> int:
+        return await self.run_background(self.client.reconcile_permissions)
+
+    async def run_permission_reconciliation(self, interval: float) -> None:
+        """
+        Periodically repairs the permission index until cancelled
+
+        :param interval: Seconds between reconciliations
+        :return: None
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                drift = await self.reconcile_permissions()
+            except Exception as error:
+                self.client.logger.error(f"Permission reconciliation failed: {error}")
+                continue
+            if drift:
+                self.client.logger.warning(
+                    f"Permission index was out of date by {drift} permissions"
+                )
+
+    def is_google_document(self, link: str) -> bool:
+        return self.client.is_google_document(link)
+
+    def is_google_spreadsheet(self, link: str) -> bool:
+        return self.client.is_google_spreadsheet(link)
+
+    def is_google_email(self, email: str) -> bool:
+        return self.client.is_google_email(email)
+
+    def generate_id(self, link: str) -> str:
+        return self.client.generate_id(link)
+
+    def quota_metrics(self) -> dict[str, dict]:
+        return self.client.quota.metrics()
+
+    def close(self) -> None:
+        self.client.close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
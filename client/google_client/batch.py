@@ -0,0 +1,231 @@
+import contextvars
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import httplib2
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+
+from client.google_client.quota import QuotaScheduler
+
+# Drive rejects batches with more sub-requests
+MAX_BATCH_SIZE = 100
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+@dataclass
+class BatchItem:
+    """
+    Sub-request of a batch.
+    Request is built for the service of the thread that sends the batch,
+    so the item could be sent again on retry
+    """
+
+    request_id: str
+    build: Callable[[Any], HttpRequest]
+
+
+@dataclass
+class BatchOutcome:
+    """Final result of the sub-request after all attempts"""
+
+    request_id: str
+    response: dict | None = None
+    error: str | None = None
+    status: int | None = None
+    attempts: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Checks if the request failed because of quota or temporary problem of Google
+
+    :param error: Exception of the request
+    :return: bool
+    """
+    if isinstance(error, (OSError, httplib2.HttpLib2Error)):
+        return True
+    if not isinstance(error, HttpError):
+        return False
+    if error.resp.status in RETRYABLE_STATUSES:
+        return True
+    if error.resp.status == 403:
+        details = error.error_details if isinstance(error.error_details, list) else []
+        reasons = {
+            detail.get("reason") for detail in details if isinstance(detail, dict)
+        }
+        return bool(reasons & RATE_LIMIT_REASONS)
+    return False
+
+
+def describe_error(error: Exception) -> str:
+    return getattr(error, "reason", None) or str(error)
+
+
+class BatchEngine:
+    """
+    Sends sub-requests in batches accepted by Google APIs.
+    Work is split into chunks of MAX_BATCH_SIZE that are sent concurrently,
+    sub-requests failed because of quota or server errors are retried
+    with exponential backoff and full jitter, other failures are returned as is
+    """
+
+    def __init__(
+        self,
+        service_factory: Callable[[], Any],
+        logger: logging.Logger,
+        chunk_size: int = MAX_BATCH_SIZE,
+        max_concurrency: int = 4,
+        max_retries: int = 5,
+        base_delay: float = 1,
+        max_delay: float = 32,
+        quota: QuotaScheduler | None = None,
+        api: str = "drive",
+    ):
+        """
+        :param service_factory: Returns service of the current thread
+        :param logger: Logger of the client
+        :param chunk_size: Maximum amount of sub-requests in one batch
+        :param max_concurrency: Maximum amount of batches sent at the same time
+        :param max_retries: Maximum amount of retries of one sub-request
+        :param base_delay: Delay before the first retry in seconds
+        :param max_delay: Maximum delay between retries in seconds
+        :param quota: Rate limits to wait for before sending each batch
+        :param api: Name of API the sub-requests belong to
+        """
+        self.service_factory = service_factory
+        self.logger = logger
+        self.chunk_size = min(chunk_size, MAX_BATCH_SIZE)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.quota = quota
+        self.api = api
+        self._executor: ThreadPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency, thread_name_prefix="google_batch"
+                )
+            return self._executor
+
+    def execute(self, items: list[BatchItem]) -> dict[str, BatchOutcome]:
+        """
+        Sends all items and waits for their final outcomes.
+        Items with the same request_id are sent once
+
+        :param items: Sub-requests to send
+        :return: Mapping of request_id to outcome
+        """
+        items = list({item.request_id: item for item in items}.values())
+        chunks = [
+            items[index : index + self.chunk_size]
+            for index in range(0, len(items), self.chunk_size)
+        ]
+        outcomes = {}
+        if len(chunks) == 1 or self.max_concurrency <= 1:
+            for chunk in chunks:
+                outcomes.update(self.execute_chunk(chunk))
+            return outcomes
+        # Context is copied to keep the priority of the caller in worker threads
+        contexts = [contextvars.copy_context() for _ in chunks]
+        for chunk_outcomes in self.executor.map(
+            lambda context, chunk: context.run(self.execute_chunk, chunk),
+            contexts,
+            chunks,
+        ):
+            outcomes.update(chunk_outcomes)
+        return outcomes
+
+    def execute_chunk(self, chunk: list[BatchItem]) -> dict[str, BatchOutcome]:
+        """
+        Sends one batch, then resends only the failed sub-requests that could succeed
+
+        :param chunk: Sub-requests that fit into one batch
+        :return: Mapping of request_id to outcome
+        """
+        outcomes: dict[str, BatchOutcome] = {}
+        pending = chunk
+        attempt = 0
+        while pending:
+            attempt += 1
+            failed = self.send(pending, outcomes, attempt)
+            if not failed or attempt > self.max_retries:
+                break
+            delay = random.uniform(
+                0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+            )
+            self.logger.warning(
+                f"Retrying {len(failed)} Google API requests in {delay:.1f}s, "
+                f"attempt {attempt + 1}"
+            )
+            time.sleep(delay)
+            pending = failed
+        for outcome in outcomes.values():
+            if not outcome.ok:
+                self.logger.error(
+                    f"Google API batch request {outcome.request_id} failed "
+                    f"after {outcome.attempts} attempts: {outcome.error}"
+                )
+        return outcomes
+
+    def send(
+        self, items: list[BatchItem], outcomes: dict[str, BatchOutcome], attempt: int
+    ) -> list[BatchItem]:
+        """
+        Sends one batch request and stores outcomes of its sub-requests
+
+        :param items: Sub-requests to send
+        :param outcomes: Mapping to store outcomes in
+        :param attempt: Number of the attempt
+        :return: Items that should be retried
+        """
+        items_by_id = {item.request_id: item for item in items}
+        retry = []
+
+        def callback(request_id, response, exception) -> None:
+            outcomes[request_id] = BatchOutcome(request_id, attempts=attempt)
+            if exception is None:
+                outcomes[request_id].response = response
+                return
+            outcomes[request_id].error = describe_error(exception)
+            if isinstance(exception, HttpError):
+                outcomes[request_id].status = exception.resp.status
+            if is_retryable(exception):
+                retry.append(items_by_id[request_id])
+
+        if self.quota is not None:
+            # Every sub-request is counted by the quota of API
+            self.quota.acquire(self.api, len(items))
+        service = self.service_factory()
+        batch = service.new_batch_http_request(callback=callback)
+        for item in items:
+            batch.add(item.build(service), request_id=item.request_id)
+        try:
+            batch.execute()
+        except (HttpError, OSError, httplib2.HttpLib2Error) as error:
+            # The whole batch failed, so none of the sub-requests was applied
+            for item in items:
+                callback(item.request_id, None, error)
+        return retry
+
+    def close(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
@@ -1,26 +1,33 @@
 from __future__ import print_function
 
 import logging
-import os.path
-import re
+import threading
+from typing import Iterable
 
 from aiogram import Bot
-from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
 
-from bot.bot import bot
+from client.google_client.batch import BatchEngine, BatchItem
+from client.google_client.credentials import CredentialManager
+from client.google_client.links import (
+    DOCUMENT_PATTERN,
+    EMAIL_PATTERN,
+    FILE_PATTERN,
+    SPREADSHEET_PATTERN,
+)
+from client.google_client.models import RevokeResult, RevokeStatus, ShareResult
+from client.google_client.permission_index import PermissionIndex
+from client.google_client.quota import QuotaScheduler
 from exceptions.exceptions import _BaseException
-from settings import settings
 from utils.utils import setup_logger
 
-# If modifying these scopes, delete the file token.json.
-SCOPES = [
-    "https://www.googleapis.com/auth/drive",
-    "https://www.googleapis.com/auth/spreadsheets",
-]
+# Rows cleaned by one request of batchUpdate
+ROWS_PER_REQUEST = 5000
+# Requests sent in one batchUpdate
+REQUESTS_PER_BATCH_UPDATE = 100
 
 
 class GoogleClientException(_BaseException):
@@ -28,65 +35,166 @@ class GoogleClientException(_BaseException):
 
 
 class GoogleClient:
-    def __init__(self, bot_: Bot, chat_id: str):
+    """
+    Client for Drive and Sheets APIs.
+    Credentials and services are created on first use or by calling connect(),
+    so creating an instance does not do any I/O.
+
+    Service objects are not thread-safe, so each thread gets its own services
+    built with the credentials shared through CredentialManager.
+
+    Every request waits for the quota of its API in QuotaScheduler,
+    so requests are not rejected by Google with 429 under load.
+
+    Drive batch requests are sent through BatchEngine, which splits them into
+    chunks accepted by Drive and retries the failed sub-requests.
+
+    Permissions of documents are mirrored in PermissionIndex, so looking up
+    a permission of the email does not require listing all permissions every time
+    """
+
+    def __init__(
+        self,
+        bot_: Bot,
+        chat_id: str,
+        batch_concurrency: int = 4,
+        batch_max_retries: int = 5,
+        quota: QuotaScheduler | None = None,
+        token_refresh_margin: float = 300,
+        excluded_sheets: Iterable[str] = (),
+    ):
+        """
+        :param batch_concurrency: Maximum amount of batch requests sent at the same time
+        :param batch_max_retries: Maximum amount of retries of failed sub-request
+        :param quota: Rate limits of APIs, all calls are made without limits by default
+        :param token_refresh_margin: Seconds before expiry to refresh credentials
+        :param excluded_sheets: Names of sheets that clean_spreadsheet keeps
+        """
         self.bot = bot_
         self.chat_id = chat_id
         self.logger = logging.getLogger(__name__)
         setup_logger(self.logger, self.bot, self.chat_id, logging.ERROR)
-        self.drive_client, self.sheets_client = self.get_client()
+        self.credential_manager = CredentialManager(
+            self.logger, refresh_margin=token_refresh_margin
+        )
+        self._local = threading.local()
+        self.permission_index = PermissionIndex()
+        self.excluded_sheets = tuple(excluded_sheets)
+        self.quota = quota or QuotaScheduler({})
+        self.batch_engine = BatchEngine(
+            lambda: self.drive_client,
+            self.logger,
+            quota=self.quota,
+            max_concurrency=batch_concurrency,
+            max_retries=batch_max_retries,
+        )
+
+    @property
+    def drive_client(self):
+        if getattr(self._local, "drive_client", None) is None:
+            self.connect()
+        return self._local.drive_client
+
+    @property
+    def sheets_client(self):
+        if getattr(self._local, "sheets_client", None) is None:
+            self.connect()
+        return self._local.sheets_client
+
+    def connect(self) -> None:
+        """
+        Loads credentials and builds services of the current thread if it was not done yet
+
+        :return: None
+        """
+        if getattr(self._local, "drive_client", None) is None:
+            drive_client, sheets_client = self.build_services(self.credentials)
+            self._local.drive_client = drive_client
+            self._local.sheets_client = sheets_client
 
     def get_client(self):
-        creds = None
-        # The file token.json stores the user's access and refresh tokens, and is
-        # created automatically when the authorization flow completes for the first
-        # time.
-        if os.path.exists("client/google_client/token.json"):
-            creds = Credentials.from_authorized_user_file(
-                "client/google_client/token.json", SCOPES
-            )
-        # If there are no (valid) google_client available, let the user log in.
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    "client/google_client/credentials.json", SCOPES
-                )
-                creds = flow.run_local_server(port=8000)
-            # Save the google_client for the next run
-            with open("client/google_client/token.json", "w") as token:
-                token.write(creds.to_json())
+        """
+        Loads credentials and builds Drive and Sheets services
+
+        :return: Drive service and Sheets service
+        """
+        return self.build_services(self.credentials)
+
+    @property
+    def credentials(self) -> Credentials:
+        return self.credential_manager.get()
+
+    def build_services(self, creds: Credentials):
+        """
+        Builds Drive and Sheets services
+
+        :param creds: Valid credentials
+        :return: Drive service and Sheets service
+        """
         try:
-            drive_service = build("drive", "v3", credentials=creds)
-            sheets_service = build("sheets", "v4", credentials=creds)
+            # Discovery documents shipped with googleapiclient are used,
+            # so building services makes no HTTP requests
+            drive_service = build(
+                "drive", "v3", credentials=creds, static_discovery=True
+            )
+            sheets_service = build(
+                "sheets", "v4", credentials=creds, static_discovery=True
+            )
             return drive_service, sheets_service
         except HttpError as error:
             self.logger.error(f"An error occurred: {error}")
             raise GoogleClientException(str(error)) from error
 
-    def share_access_to_document(self, links: list[str], email) -> None:
+    def execute(self, request: HttpRequest, api: str = "drive") -> dict:
+        """
+        Executes the request after waiting for the quota of API
+
+        :param request: Request built by a service
+        :param api: Name of API the request belongs to
+        :return: Response of the request
+        """
+        self.quota.acquire(api)
+        return request.execute()
+
+    def share_access_to_document(self, links: list[str], email) -> list[ShareResult]:
         """
         Validates that each link is Google document.
-        Generates the id of the document and gives the permissions to provided email
+        Generates the id of the document and gives the permissions to provided email.
+        Requests are sent in batches, failed because of quota requests are retried
 
         :param links: List of links
         :param email: Email to open the access
-        :return: None
+        :return: Result for each link
         """
-        batch = self.drive_client.new_batch_http_request(callback=self.callback)
         user_permission = {"type": "user", "role": "writer", "emailAddress": email}
-        for link in links:
-            file_id = self.generate_id(link)
-            batch.add(
-                self.drive_client.permissions().create(
-                    fileId=file_id, body=user_permission, fields="id"
+        file_ids = {link: self.generate_id(link) for link in dict.fromkeys(links)}
+        # File id is used as request id, so the same document is shared only once
+        outcomes = self.batch_engine.execute(
+            [
+                BatchItem(
+                    file_id,
+                    lambda service, file_id=file_id: service.permissions().create(
+                        fileId=file_id, body=user_permission, fields="id"
+                    ),
                 )
-            )
-        batch.execute()
+                for file_id in file_ids.values()
+                if file_id is not None
+            ]
+        )
+        for file_id, outcome in outcomes.items():
+            if outcome.ok:
+                self.permission_index.add(file_id, email, outcome.response.get("id"))
+        return [
+            ShareResult(link, outcomes[file_id].error)
+            if file_id is not None
+            else ShareResult(link, "Link is not a Google document")
+            for link, file_id in file_ids.items()
+        ]
 
     def get_permission_id(self, link: str, email: str) -> str | None:
         """
-        Returns permission_id for document based on email
+        Returns permission_id for document based on email.
+        Permissions of the document are listed only on first lookup, then the index is used
 
         :param link: Link to the document
         :param email: Email to search through
@@ -97,15 +205,132 @@ class GoogleClient:
         except GoogleClientException as e:
             self.logger.error(f"Error while generating ID: {e}")
             return None
-        permissions = (
-            self.drive_client.permissions()
-            .list(fileId=generated_id, fields="permissions(id, emailAddress)")
-            .execute()
+        if not self.permission_index.is_loaded(generated_id):
+            self.permission_index.set_file(
+                generated_id, self.list_permissions(generated_id)
+            )
+        return self.permission_index.get(generated_id, email)
+
+    def load_permissions(self, file_ids: list[str]) -> dict[str, str]:
+        """
+        Loads permissions of the documents missing in the index with batch requests.
+        Documents with more than one page of permissions are listed separately
+
+        :param file_ids: IDs of the documents
+        :return: Mapping of file_id to error for documents that could not be loaded
+        """
+        outcomes = self.batch_engine.execute(
+            [
+                BatchItem(
+                    file_id,
+                    lambda service, file_id=file_id: service.permissions().list(
+                        fileId=file_id,
+                        fields="nextPageToken, permissions(id, emailAddress)",
+                        pageSize=100,
+                    ),
+                )
+                for file_id in file_ids
+                if not self.permission_index.is_loaded(file_id)
+            ]
         )
-        for permission in permissions.get("permissions", []):
-            if permission.get("emailAddress", "").lower() == email:
-                return permission.get("id")
-        return None
+        errors = {}
+        for file_id, outcome in outcomes.items():
+            if not outcome.ok:
+                errors[file_id] = outcome.error
+            elif outcome.response.get("nextPageToken"):
+                try:
+                    self.permission_index.set_file(
+                        file_id, self.list_permissions(file_id)
+                    )
+                except HttpError as error:
+                    errors[file_id] = str(error)
+            else:
+                self.permission_index.set_file(
+                    file_id,
+                    {
+                        permission["emailAddress"]: permission.get("id")
+                        for permission in outcome.response.get("permissions", [])
+                        if permission.get("emailAddress")
+                    },
+                )
+        return errors
+
+    def list_permissions(self, file_id: str) -> dict[str, str]:
+        """
+        Lists all permissions of the document, going through every page
+
+        :param file_id: ID of the document
+        :return: Mapping of email to permission_id
+        """
+        permissions = {}
+        page_token = None
+        while True:
+            response = self.execute(
+                self.drive_client.permissions().list(
+                    fileId=file_id,
+                    fields="nextPageToken, permissions(id, emailAddress)",
+                    pageSize=100,
+                    pageToken=page_token,
+                )
+            )
+            for permission in response.get("permissions", []):
+                if permission.get("emailAddress"):
+                    permissions[permission["emailAddress"]] = permission.get("id")
+            page_token = response.get("nextPageToken")
+            if page_token is None:
+                return permissions
+
+    def get_start_page_token(self) -> str:
+        """
+        Returns the token of the current position in Drive changes feed
+
+        :return: Page token
+        """
+        response = self.execute(self.drive_client.changes().getStartPageToken())
+        return response["startPageToken"]
+
+    def list_changes(self, page_token: str) -> tuple[list[dict], str]:
+        """
+        Lists all Drive changes made after the page token, going through every page
+
+        :param page_token: Token saved after the previous sync
+        :return: List of changes and the token to start the next sync from
+        """
+        changes = []
+        while True:
+            response = self.execute(
+                self.drive_client.changes().list(
+                    pageToken=page_token,
+                    pageSize=1000,
+                    fields=(
+                        "nextPageToken, newStartPageToken, changes(fileId, removed, "
+                        "time, file(trashed, permissions(id, emailAddress)))"
+                    ),
+                )
+            )
+            changes.extend(response.get("changes", []))
+            if "newStartPageToken" in response:
+                return changes, response["newStartPageToken"]
+            page_token = response["nextPageToken"]
+
+    def reconcile_permissions(self) -> int:
+        """
+        Reloads permissions of every indexed document to repair changes made outside of the bot
+
+        :return: Amount of permissions that were out of date
+        """
+        drift = 0
+        for file_id in self.permission_index.loaded_files():
+            try:
+                drift += self.permission_index.set_file(
+                    file_id, self.list_permissions(file_id)
+                )
+            except HttpError as error:
+                self.logger.error(
+                    f"Error while reconciling permissions of {file_id}: {error}"
+                )
+                self.permission_index.invalidate(file_id)
+        return drift
 
     def remove_access(self, link: str, permission_id: str) -> None:
         """
@@ -123,43 +348,151 @@ class GoogleClient:
         command = self.drive_client.permissions().delete(
             fileId=generated_id, permissionId=permission_id
         )
-        command.execute()
+        self.execute(command)
+        self.permission_index.remove(generated_id, permission_id)
         self.logger.info(f"Removed access from user")
 
+    def revoke_access(self, links: list[str], email: str) -> list[RevokeResult]:
+        """
+        Removes the access of the email from every document.
+        Permission IDs are taken from the index, missing documents are loaded
+        with batch requests, and all deletions are sent in batch requests.
+        Failure of one document does not stop the others
+
+        :param links: Links to the documents
+        :param email: Email to remove the access of
+        :return: Result for each link in the same order
+        """
+        results: dict[str, RevokeResult] = {}
+        file_ids: dict[str, str] = {}
+        for link in dict.fromkeys(links):
+            file_id = self.generate_id(link)
+            if file_id is None:
+                results[link] = RevokeResult(
+                    link, RevokeStatus.ERROR, "Link is not a Google document"
+                )
+            else:
+                file_ids[link] = file_id
+        load_errors = self.load_permissions(list(file_ids.values()))
+        # Permission of the same document is deleted only once for duplicate links
+        pending: dict[str, str] = {}
+        for link, file_id in file_ids.items():
+            if file_id in load_errors:
+                results[link] = RevokeResult(
+                    link, RevokeStatus.ERROR, load_errors[file_id]
+                )
+                continue
+            permission_id = self.permission_index.get(file_id, email)
+            if permission_id is None:
+                results[link] = RevokeResult(link, RevokeStatus.NOT_PRESENT)
+            else:
+                pending[file_id] = permission_id
+        outcomes = self.batch_engine.execute(
+            [
+                BatchItem(
+                    file_id,
+                    lambda service, file_id=file_id, permission_id=permission_id: (
+                        service.permissions().delete(
+                            fileId=file_id, permissionId=permission_id
+                        )
+                    ),
+                )
+                for file_id, permission_id in pending.items()
+            ]
+        )
+        statuses: dict[str, tuple[RevokeStatus, str | None]] = {}
+        for file_id, outcome in outcomes.items():
+            self.permission_index.remove(file_id, pending[file_id])
+            if outcome.ok:
+                statuses[file_id] = (RevokeStatus.REMOVED, None)
+            elif outcome.status == 404:
+                # Permission was already removed outside of the bot
+                statuses[file_id] = (RevokeStatus.NOT_PRESENT, None)
+            else:
+                self.permission_index.invalidate(file_id)
+                statuses[file_id] = (RevokeStatus.ERROR, outcome.error)
+        for link, file_id in file_ids.items():
+            if link not in results:
+                results[link] = RevokeResult(link, *statuses[file_id])
+        return [results[link] for link in dict.fromkeys(links)]
+
     # TODO update with buttons
-    def clean_spreadsheet(self, link):
+    def clean_spreadsheet(
+        self, link: str, excluded_sheets: Iterable[str] | None = None
+    ) -> list[dict]:
         """
-        Receives spreadsheet object using drive client.
-        For each sheet of spreadsheet cleans the range in updateCells and highlights in white in repeatCell.
-        All these updates are stored in requests list and send to batchUpdate function to execute at once
+        Receives only properties of the sheets of spreadsheet.
+        For each sheet cleans the values from the 4th column and highlights the rows
+        in white, ranges are sized by the grid of the sheet, so big sheets are cleaned
+        fully. Header row is kept. Ranges are split by ROWS_PER_REQUEST rows and sent
+        in batchUpdate requests of at most REQUESTS_PER_BATCH_UPDATE requests
+
+        :param link: Link to the spreadsheet
+        :param excluded_sheets: Names of sheets to keep, case-insensitive.
+            Names given to the client are used by default
+        :return: Responses of batchUpdate requests
         """
+        if excluded_sheets is None:
+            excluded_sheets = self.excluded_sheets
+        excluded = {name.casefold() for name in excluded_sheets}
         spreadsheet_id = self.generate_id(link)
-        spreadsheet = (
-            self.sheets_client.spreadsheets()
-            .get(spreadsheetId=spreadsheet_id)
-            .execute()
+        spreadsheet = self.execute(
+            self.sheets_client.spreadsheets().get(
+                spreadsheetId=spreadsheet_id,
+                fields="sheets.properties(sheetId,title,gridProperties)",
+            ),
+            api="sheets",
         )
         requests = []
-        for sheet in spreadsheet["sheets"]:
-            sheet_name = sheet.get("properties", {}).get("title")
-            sheet_id = sheet.get("properties", {}).get("sheetId")
-            # TODO take list names to exclude from button
-            if sheet_name.lower() in ["Tasks", "Косяки", "инфа об авторах"]:
+        for sheet in spreadsheet.get("sheets", []):
+            properties = sheet.get("properties", {})
+            if properties.get("title", "").casefold() in excluded:
                 continue
-
-            requests.append(
-                {
-                    "updateCells": {
-                        "range": self.get_grid_range(sheet_id, 1, 1000, 3, 26),
-                        "fields": "userEnteredValue",
-                    }
-                }
+            requests.extend(self.clean_sheet_requests(properties))
+        responses = []
+        for start in range(0, len(requests), REQUESTS_PER_BATCH_UPDATE):
+            body = {"requests": requests[start : start + REQUESTS_PER_BATCH_UPDATE]}
+            responses.append(
+                self.execute(
+                    self.sheets_client.spreadsheets().batchUpdate(
+                        spreadsheetId=spreadsheet_id, body=body
+                    ),
+                    api="sheets",
+                )
             )
+        return responses
+
+    def clean_sheet_requests(self, properties: dict) -> list[dict]:
+        """
+        Builds requests cleaning the sheet within its grid
 
+        :param properties: Properties of the sheet
+        :return: updateCells and repeatCell requests
+        """
+        sheet_id = properties.get("sheetId")
+        grid = properties.get("gridProperties", {})
+        row_count = grid.get("rowCount", 0)
+        column_count = grid.get("columnCount", 0)
+        requests = []
+        for start_row in range(1, row_count, ROWS_PER_REQUEST):
+            end_row = min(start_row + ROWS_PER_REQUEST, row_count)
+            if column_count > 3:
+                requests.append(
+                    {
+                        "updateCells": {
+                            "range": self.get_grid_range(
+                                sheet_id, start_row, end_row, 3, column_count
+                            ),
+                            "fields": "userEnteredValue",
+                        }
+                    }
+                )
             requests.append(
                 {
                     "repeatCell": {
-                        "range": self.get_grid_range(sheet_id, 1, 1000, 0, 26),
+                        "range": self.get_grid_range(
+                            sheet_id, start_row, end_row, 0, column_count
+                        ),
                         "cell": {
                             "userEnteredFormat": {
                                 "backgroundColor": {
@@ -173,54 +506,25 @@ class GoogleClient:
                     }
                 }
             )
-        if requests:
-            body = {"requests": requests}
-            response = (
-                self.sheets_client.spreadsheets()
-                .batchUpdate(spreadsheetId=spreadsheet_id, body=body)
-                .execute()
-            )
-            return response
-
-    def callback(self, request_id, response, exception) -> None:
-        """
-        Callback function to handle error in each request to Google API
-        :param request_id: ID of request provided or generated by user
-        :param response: Response received from Google API
-        :param exception: Potential error we might receive
-        :return: None
-        """
-        if exception is not None:
-            # Handle error
-            self.logger.error(
-                f"Google API batch request {request_id} failed: {exception}"
-            )
-        else:
-            # Handle successful response
-            self.logger.info(
-                f"Response from Google API batch request {request_id}: {response}"
-            )
+        return requests
 
     def is_google_document(self, link: str):
         """Validates that the link is a document"""
         if not isinstance(link, str):
             raise GoogleClientException("Link should be a string")
-        pattern = r"(https://docs.google.com/document/d/)([a-zA-Z0-9-_]+)"
-        return bool(re.match(pattern, link))
+        return bool(DOCUMENT_PATTERN.match(link))
 
     def is_google_spreadsheet(self, link: str):
         """Validates that the link is spreadsheet"""
         if not isinstance(link, str):
             raise GoogleClientException("Link should be a string")
-        pattern = r"(https://docs.google.com/spreadsheets/d/)([a-zA-Z0-9-_]+)"
-        return bool(re.match(pattern, link))
+        return bool(SPREADSHEET_PATTERN.match(link))
 
     def generate_id(self, link: str) -> str:
         """Generates the id of the file from link to open the access"""
         if not isinstance(link, str):
             raise GoogleClientException("Link should be a string")
-        pattern = r"(https://docs.google.com/[^/]+/d/)([a-zA-Z0-9-_]+)"
-        match = re.match(pattern, link)
+        match = FILE_PATTERN.match(link)
         if match:
             file_id = match.group(2)
             return file_id
@@ -235,7 +539,8 @@ class GoogleClient:
             "endColumnIndex": end_col,
         }
 
-    def is_google_email(self, email: str) -> bool:
+    @staticmethod
+    def is_google_email(email: str) -> bool:
         """
         Validates if the provided email is a Google email.
 
@@ -244,13 +549,11 @@ class GoogleClient:
         """
         if not isinstance(email, str):
             raise GoogleClientException("Email should be a string")
-        email_pattern = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
-        if not email_pattern.fullmatch(email):
+        if not EMAIL_PATTERN.fullmatch(email):
             return False
         domain = email.split("@")[1].lower()
         # Check if the domain is gmail.com or your custom Google Workspace domain
         return domain in ["gmail.com", "biggiko.com", "alreadymedia.com"]
 
-
-author_chat_id = settings.author_chat_id
-google_client = GoogleClient(bot, author_chat_id)
+    def close(self) -> None:
+        self.batch_engine.close()
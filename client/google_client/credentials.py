@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+
+# If modifying these scopes, delete the file token.json.
+SCOPES = [
+    "https://www.googleapis.com/auth/drive",
+    "https://www.googleapis.com/auth/spreadsheets",
+]
+TOKEN_PATH = "client/google_client/token.json"
+CLIENT_SECRETS_PATH = "client/google_client/credentials.json"
+
+
+class CredentialManager:
+    """
+    Owns OAuth credentials shared by all worker threads of GoogleClient.
+    Credentials are refreshed by a background task before they expire,
+    so requests of users never wait for the token endpoint.
+    Refreshed token is written to token.json atomically, only by this class
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger,
+        token_path: str = TOKEN_PATH,
+        client_secrets_path: str = CLIENT_SECRETS_PATH,
+        refresh_margin: float = 300,
+    ):
+        """
+        :param logger: Logger of the client
+        :param token_path: File with access and refresh tokens
+        :param client_secrets_path: File with OAuth client used by authorization flow
+        :param refresh_margin: Seconds before expiry when credentials are refreshed
+        """
+        self.logger = logger
+        self.token_path = token_path
+        self.client_secrets_path = client_secrets_path
+        self.refresh_margin = refresh_margin
+        self.credentials: Credentials | None = None
+        self.refreshed_at: datetime | None = None
+        self._lock = threading.RLock()
+
+    def get(self) -> Credentials:
+        """
+        Returns shared credentials, loading them on first call
+
+        :return: Valid credentials
+        """
+        with self._lock:
+            if self.credentials is None:
+                self.credentials = self.load()
+            return self.credentials
+
+    def load(self) -> Credentials:
+        """
+        Reads credentials from token.json, refreshing them or running
+        the authorization flow if they are not valid
+
+        :return: Valid credentials
+        """
+        creds = None
+        # The file token.json stores the user's access and refresh tokens, and is
+        # created automatically when the authorization flow completes for the first
+        # time.
+        if os.path.exists(self.token_path):
+            creds = Credentials.from_authorized_user_file(self.token_path, SCOPES)
+        if creds and creds.valid and not self.expires_soon(creds):
+            return creds
+        if creds and creds.refresh_token:
+            creds.refresh(Request())
+        else:
+            flow = InstalledAppFlow.from_client_secrets_file(
+                self.client_secrets_path, SCOPES
+            )
+            creds = flow.run_local_server(port=8000)
+        self.refreshed_at = datetime.utcnow()
+        self.save(creds)
+        return creds
+
+    def expires_soon(self, creds: Credentials) -> bool:
+        if creds.expiry is None:
+            return False
+        return self.seconds_until_expiry(creds) <= self.refresh_margin
+
+    @staticmethod
+    def seconds_until_expiry(creds: Credentials) -> float:
+        # Expiry of google-auth credentials is naive UTC time
+        return (creds.expiry - datetime.utcnow()).total_seconds()
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Refreshes shared credentials in place if they expire soon.
+        Services of all threads use the same object, so they get the new token at once
+
+        :param force: Refresh even if the token is still fresh
+        :return: True if credentials were refreshed
+        """
+        with self._lock:
+            creds = self.get()
+            if not force and not self.expires_soon(creds):
+                return False
+            creds.refresh(Request())
+            self.refreshed_at = datetime.utcnow()
+            self.save(creds)
+        self.logger.info(f"Google credentials were refreshed, expire at {creds.expiry}")
+        return True
+
+    def save(self, creds: Credentials) -> None:
+        """
+        Writes credentials to temporary file and replaces token.json with it,
+        so the file is never left half written
+
+        :param creds: Credentials to save
+        :return: None
+        """
+        directory = os.path.dirname(self.token_path) or "."
+        descriptor, temporary_path = tempfile.mkstemp(
+            dir=directory, prefix=".token.", suffix=".json"
+        )
+        try:
+            with os.fdopen(descriptor, "w") as file:
+                file.write(creds.to_json())
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary_path, self.token_path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+
+    def seconds_until_refresh(self) -> float:
+        with self._lock:
+            creds = self.get()
+            if creds.expiry is None:
+                return self.refresh_margin
+            return max(0.0, self.seconds_until_expiry(creds) - self.refresh_margin)
+
+    async def run(self, retry_delay: float = 30) -> None:
+        """
+        Refreshes credentials before expiry until cancelled.
+        Blocking calls are done in a worker thread
+
+        :param retry_delay: Seconds to wait after failed refresh
+        :return: None
+        """
+        while True:
+            try:
+                delay = await asyncio.to_thread(self.seconds_until_refresh)
+                await asyncio.sleep(delay)
+                await asyncio.to_thread(self.refresh)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                self.logger.error(f"Google credentials refresh failed: {error}")
+                await asyncio.sleep(retry_delay)
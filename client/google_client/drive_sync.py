@@ -0,0 +1,171 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from aiogram import Bot
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from client.google_client.async_client import AsyncGoogleClient
+from utils.utils import setup_logger
+
+PAGE_TOKEN_ID = "drive_changes"
+
+
+class DriveSyncWorker:
+    """
+    Follows Drive changes feed and updates local caches of the changed files.
+    Permissions of the changed files are refreshed in PermissionIndex,
+    so only changed files cost API quota.
+    The page token is kept in MongoDB, so the sync continues from the same place
+    after restart
+    """
+
+    def __init__(
+        self,
+        google_client: AsyncGoogleClient,
+        state_collection: AsyncIOMotorCollection,
+        bot_: Bot,
+        chat_id: str | int,
+        interval: float = 60,
+    ):
+        """
+        :param google_client: Client to read the changes with
+        :param state_collection: Collection to keep the page token in
+        :param interval: Seconds between syncs
+        """
+        self.google_client = google_client
+        self.state_collection = state_collection
+        self.interval = interval
+        self.files_removed = 0
+        self.permissions_refreshed = 0
+        self.last_sync_at: datetime | None = None
+        self.last_change_at: datetime | None = None
+        self.last_sync_lag: float | None = None
+        self.changes_processed = 0
+        self.syncs = 0
+        self.bot = bot_
+        self.chat_id = chat_id
+        self.logger = logging.getLogger(__name__)
+        setup_logger(self.logger, self.bot, self.chat_id, logging.WARNING)
+
+    @property
+    def permission_index(self):
+        return self.google_client.client.permission_index
+
+    def metrics(self) -> dict:
+        """
+        Returns the state of the sync.
+        Lag is the time between the newest change of the last sync and its processing
+
+        :return: Dictionary with metrics
+        """
+        since_last_sync = (
+            (datetime.now(timezone.utc) - self.last_sync_at).total_seconds()
+            if self.last_sync_at
+            else None
+        )
+        return {
+            "syncs": self.syncs,
+            "changes_processed": self.changes_processed,
+            "files_removed": self.files_removed,
+            "permissions_refreshed": self.permissions_refreshed,
+            "last_sync_at": self.last_sync_at,
+            "seconds_since_last_sync": since_last_sync,
+            "last_change_at": self.last_change_at,
+            "last_sync_lag": self.last_sync_lag,
+        }
+
+    async def load_page_token(self) -> str | None:
+        document = await self.state_collection.find_one({"_id": PAGE_TOKEN_ID})
+        return document.get("page_token") if document else None
+
+    async def save_page_token(self, page_token: str) -> None:
+        await self.state_collection.update_one(
+            {"_id": PAGE_TOKEN_ID},
+            {
+                "$set": {
+                    "page_token": page_token,
+                    "updated_at": datetime.now(timezone.utc),
+                }
+            },
+            upsert=True,
+        )
+
+    async def run(self) -> None:
+        """
+        Syncs the changes every interval seconds until cancelled
+
+        :return: None
+        """
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                self.logger.error(f"Drive sync failed: {error}")
+            await asyncio.sleep(self.interval)
+
+    async def sync(self) -> int:
+        """
+        Applies all changes made since the saved page token and saves the new token.
+        On the first run only the current position of the feed is saved
+
+        :return: Amount of processed changes
+        """
+        page_token = await self.load_page_token()
+        if page_token is None:
+            start_page_token = await self.google_client.get_start_page_token()
+            await self.save_page_token(start_page_token)
+            self.last_sync_at = datetime.now(timezone.utc)
+            return 0
+        changes, new_page_token = await self.google_client.list_changes(page_token)
+        for change in changes:
+            self.apply_change(change)
+        await self.save_page_token(new_page_token)
+        self.last_sync_at = datetime.now(timezone.utc)
+        self.syncs += 1
+        self.changes_processed += len(changes)
+        change_times = [
+            datetime.fromisoformat(change["time"].replace("Z", "+00:00"))
+            for change in changes
+            if change.get("time")
+        ]
+        if change_times:
+            self.last_change_at = max(change_times)
+            self.last_sync_lag = (
+                self.last_sync_at - self.last_change_at
+            ).total_seconds()
+        return len(changes)
+
+    def apply_change(self, change: dict) -> None:
+        """
+        Updates permissions of the changed file.
+        Permissions are refreshed only for the files that are already indexed,
+        if the change does not contain them the file is reloaded on next lookup
+
+        :param change: Change returned by Drive
+        :return: None
+        """
+        file_id = change.get("fileId")
+        if file_id is None:
+            return
+        file = change.get("file") or {}
+        if change.get("removed") or file.get("trashed"):
+            self.files_removed += 1
+            self.permission_index.invalidate(file_id)
+            return
+        if not self.permission_index.is_loaded(file_id):
+            return
+        self.permissions_refreshed += 1
+        if "permissions" in file:
+            self.permission_index.set_file(
+                file_id,
+                {
+                    permission["emailAddress"]: permission.get("id")
+                    for permission in file["permissions"]
+                    if permission.get("emailAddress")
+                },
+            )
+        else:
+            self.permission_index.invalidate(file_id)
@@ -0,0 +1,79 @@
+import codecs
+import re
+
+DOCUMENT_PATTERN = re.compile(r"(https://docs.google.com/document/d/)([a-zA-Z0-9-_]+)")
+SPREADSHEET_PATTERN = re.compile(
+    r"(https://docs.google.com/spreadsheets/d/)([a-zA-Z0-9-_]+)"
+)
+FILE_PATTERN = re.compile(r"(https://docs.google.com/[^/]+/d/)([a-zA-Z0-9-_]+)")
+EMAIL_PATTERN = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
+# Links are separated by spaces, commas and new lines, quotes and semicolons of CSV
+# cells are separators as well
+SEPARATOR_PATTERN = re.compile(r"[\s,;\"']+")
+
+
+class LinkCollector:
+    """
+    Splits text received in chunks into links and classifies each link once.
+    Google documents are deduplicated by file id, other tokens are counted
+    as invalid links and only the first max_invalid of them are kept.
+    Token split between two chunks is kept until the next chunk arrives,
+    so the whole text never has to be in memory
+    """
+
+    def __init__(self, max_invalid: int = 50):
+        """
+        :param max_invalid: Amount of invalid links to keep for the report
+        """
+        self.documents: dict[str, str] = {}
+        self.invalid: list[str] = []
+        self.invalid_count = 0
+        self.duplicates = 0
+        self.max_invalid = max_invalid
+        self._tail = ""
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    @property
+    def total(self) -> int:
+        return len(self.documents) + self.duplicates + self.invalid_count
+
+    def feed_bytes(self, chunk: bytes) -> None:
+        self.feed(self._decoder.decode(chunk))
+
+    def feed(self, text: str) -> None:
+        """
+        Classifies all complete links of the text
+
+        :param text: Next part of the text
+        :return: None
+        """
+        tokens = SEPARATOR_PATTERN.split(self._tail + text)
+        # The last token could continue in the next chunk
+        self._tail = tokens.pop()
+        for token in tokens:
+            self.add(token)
+
+    def close(self) -> None:
+        """Classifies the rest of the text"""
+        self.feed(self._decoder.decode(b"", final=True))
+        self.add(self._tail)
+        self._tail = ""
+
+    def add(self, token: str) -> None:
+        if not token:
+            return
+        match = DOCUMENT_PATTERN.match(token)
+        if match is None:
+            self.invalid_count += 1
+            if len(self.invalid) < self.max_invalid:
+                self.invalid.append(token)
+        elif match.group(2) in self.documents:
+            self.duplicates += 1
+        else:
+            self.documents[match.group(2)] = token
+
+    def links(self) -> dict[str, str]:
+        """
+        :return: Mapping of link to file id of unique documents
+        """
+        return {link: file_id for file_id, link in self.documents.items()}
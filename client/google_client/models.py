@@ -0,0 +1,33 @@
+from dataclasses import dataclass
+from enum import Enum
+
+
+class RevokeStatus(str, Enum):
+    REMOVED = "removed"
+    NOT_PRESENT = "not present"
+    ERROR = "error"
+
+
+@dataclass
+class RevokeResult:
+    """Outcome of removing the access of the email from one document"""
+
+    link: str
+    status: RevokeStatus
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status is not RevokeStatus.ERROR
+
+
+@dataclass
+class ShareResult:
+    """Outcome of opening the access to one document"""
+
+    link: str
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
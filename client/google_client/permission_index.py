@@ -0,0 +1,89 @@
+import threading
+import time
+
+
+class PermissionIndex:
+    """
+    Local mirror of Drive permissions that maps (file_id, email) to permission_id.
+    Permissions of a file are loaded once and then kept up to date by the grants
+    and revokes made by the bot. Changes made outside of the bot are repaired by
+    reloading the file. Safe to use from several threads
+    """
+
+    def __init__(self):
+        self._files: dict[str, dict[str, str]] = {}
+        self._loaded_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def is_loaded(self, file_id: str) -> bool:
+        with self._lock:
+            return file_id in self._files
+
+    def loaded_files(self) -> list[str]:
+        with self._lock:
+            return list(self._files)
+
+    def loaded_at(self, file_id: str) -> float | None:
+        with self._lock:
+            return self._loaded_at.get(file_id)
+
+    def get(self, file_id: str, email: str) -> str | None:
+        """
+        Returns permission_id of the email. File should be loaded before
+
+        :param file_id: ID of the document
+        :param email: Email to search through
+        :return: The ID of the permission or None if the email has no access
+        """
+        with self._lock:
+            return self._files.get(file_id, {}).get(email.lower())
+
+    def set_file(self, file_id: str, permissions: dict[str, str]) -> int:
+        """
+        Replaces all permissions of the file
+
+        :param file_id: ID of the document
+        :param permissions: Mapping of email to permission_id
+        :return: Amount of entries that differ from the previous version
+        """
+        permissions = {email.lower(): id_ for email, id_ in permissions.items()}
+        with self._lock:
+            previous = self._files.get(file_id, {})
+            self._files[file_id] = permissions
+            self._loaded_at[file_id] = time.time()
+        return len(set(previous.items()) ^ set(permissions.items()))
+
+    def add(self, file_id: str, email: str, permission_id: str) -> None:
+        """
+        Stores the permission granted by the bot.
+        Files that were not loaded yet are skipped, as their index would be incomplete
+
+        :param file_id: ID of the document
+        :param email: Email that received the access
+        :param permission_id: The ID of the permission
+        :return: None
+        """
+        with self._lock:
+            if file_id in self._files:
+                self._files[file_id][email.lower()] = permission_id
+
+    def remove(self, file_id: str, permission_id: str) -> None:
+        """
+        Forgets the permission revoked by the bot
+
+        :param file_id: ID of the document
+        :param permission_id: The ID of the permission
+        :return: None
+        """
+        with self._lock:
+            permissions = self._files.get(file_id)
+            if permissions is None:
+                return
+            for email, id_ in list(permissions.items()):
+                if id_ == permission_id:
+                    del permissions[email]
+
+    def invalidate(self, file_id: str) -> None:
+        with self._lock:
+            self._files.pop(file_id, None)
+            self._loaded_at.pop(file_id, None)
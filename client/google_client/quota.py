@@ -0,0 +1,145 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import Enum
+from typing import Iterator
+
+
+class Priority(str, Enum):
+    INTERACTIVE = "interactive"
+    BACKGROUND = "background"
+
+
+# Priority of Google API calls made in the current context.
+# Calls made on behalf of a user are interactive unless marked otherwise
+request_priority: ContextVar[Priority] = ContextVar(
+    "request_priority", default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def background_priority() -> Iterator[None]:
+    """Marks Google API calls made inside the block as background work"""
+    token = request_priority.set(Priority.BACKGROUND)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at the rate of the quota.
+    Background requests wait while there are interactive requests waiting,
+    so users are served first when the quota is exhausted.
+    Requests bigger than the bucket wait for the full bucket and take it into debt
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        :param rate: Requests per second
+        :param capacity: Maximum burst of requests
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.condition = threading.Condition()
+        self.waiting = {priority: 0 for priority in Priority}
+        self.acquired = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def acquire(self, cost: float = 1, priority: Priority | None = None) -> float:
+        """
+        Blocks until the bucket has enough tokens for the request
+
+        :param cost: Amount of requests to take
+        :param priority: Priority of the request, taken from the context by default
+        :return: Seconds spent waiting
+        """
+        priority = priority or request_priority.get()
+        needed = min(cost, self.capacity)
+        started_at = time.monotonic()
+        with self.condition:
+            self.waiting[priority] += 1
+            try:
+                while True:
+                    self._refill()
+                    yields = (
+                        priority is Priority.BACKGROUND
+                        and self.waiting[Priority.INTERACTIVE] > 0
+                    )
+                    if not yields and self.tokens >= needed:
+                        break
+                    timeout = (
+                        (needed - self.tokens) / self.rate
+                        if self.tokens < needed
+                        else None
+                    )
+                    self.condition.wait(timeout)
+                self.tokens -= cost
+            finally:
+                self.waiting[priority] -= 1
+                self.condition.notify_all()
+            waited = time.monotonic() - started_at
+            self.acquired += cost
+            if waited > 0.001:
+                self.throttled += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    def metrics(self) -> dict:
+        with self.condition:
+            self._refill()
+            return {
+                "tokens": round(self.tokens, 2),
+                "queue_depth": {
+                    priority.value: count for priority, count in self.waiting.items()
+                },
+                "acquired": self.acquired,
+                "throttled": self.throttled,
+                "total_wait": round(self.total_wait, 3),
+                "max_wait": round(self.max_wait, 3),
+            }
+
+
+class QuotaScheduler:
+    """
+    Client-side rate limiter shared by all calls of GoogleClient.
+    Every API has its own bucket, as Drive and Sheets quotas are counted separately
+    """
+
+    def __init__(self, limits: dict[str, tuple[float, float]]):
+        """
+        :param limits: Mapping of API name to requests per second and burst
+        """
+        self.buckets = {
+            api: TokenBucket(rate, capacity) for api, (rate, capacity) in limits.items()
+        }
+
+    def acquire(self, api: str, cost: float = 1) -> float:
+        """
+        Waits for the quota of API. APIs without limits are not throttled
+
+        :param api: Name of API, e.g. drive
+        :param cost: Amount of requests
+        :return: Seconds spent waiting
+        """
+        bucket = self.buckets.get(api)
+        if bucket is None:
+            return 0
+        return bucket.acquire(cost)
+
+    def metrics(self) -> dict[str, dict]:
+        return {api: bucket.metrics() for api, bucket in self.buckets.items()}
@@ -0,0 +1,346 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReturnDocument, UpdateOne
+
+from client.mongo_client.indexes import IndexReport, IndexSpec, async_ensure_indexes
+
+GRANT = "grant"
+REVOKE = "revoke"
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+ACTIVE_STATUSES = [PENDING, RUNNING]
+
+
+class AccessJobQueue:
+    """
+    Queue of access grants and revokes kept in MongoDB, so requests survive restarts.
+
+    Job is identified by (action, file_id, email): enqueueing the same job again
+    while it is waiting joins the existing one instead of creating a duplicate.
+    Jobs are leased by workers for lease_seconds, a job of a crashed worker
+    becomes available again when its lease expires.
+    Jobs enqueued by one request form a batch that remembers the message
+    to edit when all of them are finished
+    """
+
+    def __init__(
+        self,
+        jobs_collection: AsyncIOMotorCollection,
+        batches_collection: AsyncIOMotorCollection,
+        retention: int = 7 * 86400,
+    ):
+        """
+        :param jobs_collection: Collection to keep the jobs in
+        :param batches_collection: Collection to keep the batches in
+        :param retention: Seconds to keep finished jobs and batches
+        """
+        self.jobs = jobs_collection
+        self.batches = batches_collection
+        self.retention = retention
+        self.listeners: list[asyncio.Event] = []
+
+    async def setup(self) -> list[IndexReport]:
+        """
+        Creates indexes used by workers and TTL indexes removing old jobs and batches
+
+        :return: Reports of the reconciliation
+        """
+        job_specs = [
+            IndexSpec("status_next_run_at", (("status", 1), ("next_run_at", 1))),
+            IndexSpec("lease_id", (("lease_id", 1),)),
+            IndexSpec(
+                "finished_at_ttl",
+                (("finished_at", 1),),
+                expire_after_seconds=self.retention,
+            ),
+        ]
+        batch_specs = [
+            IndexSpec(
+                "created_at_ttl",
+                (("created_at", 1),),
+                expire_after_seconds=self.retention,
+            ),
+        ]
+        return [
+            await async_ensure_indexes(self.jobs, job_specs),
+            await async_ensure_indexes(self.batches, batch_specs),
+        ]
+
+    def subscribe(self) -> asyncio.Event:
+        """
+        Returns event of one worker that is set when new jobs are enqueued.
+        Every worker has its own event, so clearing it never hides new jobs
+        from other workers
+
+        :return: Event of the worker
+        """
+        listener = asyncio.Event()
+        self.listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener: asyncio.Event) -> None:
+        self.listeners.remove(listener)
+
+    @staticmethod
+    def job_id(action: str, file_id: str, email: str) -> str:
+        return f"{action}:{file_id}:{email.lower()}"
+
+    async def enqueue(
+        self,
+        action: str,
+        email: str,
+        file_ids: dict[str, str],
+        chat_id: int | str,
+        message_id: int,
+        header: str,
+        footer: str = "",
+        labels: dict[str, str] | None = None,
+    ) -> str:
+        """
+        Records the jobs and the batch with one bulk write per collection.
+        Batch left by a crash before its jobs were written has no active jobs,
+        so it is finished by the worker on start
+
+        :param action: GRANT or REVOKE
+        :param email: Email to open or remove the access of
+        :param file_ids: Mapping of link to the ID of the document
+        :param chat_id: Chat of the message to edit with the result
+        :param message_id: Message to edit with the result
+        :param header: Text shown before the results
+        :param footer: Text shown after the results
+        :param labels: Names to show instead of the links
+        :return: ID of the batch
+        """
+        now = datetime.now(timezone.utc)
+        batch_id = uuid.uuid4().hex
+        job_ids = {}
+        for link, file_id in file_ids.items():
+            job_ids.setdefault(self.job_id(action, file_id, email), (link, file_id))
+        # Waiting job is joined, finished job is started again
+        is_active = {"$in": ["$status", ACTIVE_STATUSES]}
+        operations = [
+            UpdateOne(
+                {"_id": job_id},
+                [
+                    {
+                        "$set": {
+                            "action": action,
+                            "email": email,
+                            "file_id": file_id,
+                            "link": {"$ifNull": ["$link", link]},
+                            "batch_ids": {
+                                "$setUnion": [
+                                    {"$ifNull": ["$batch_ids", []]},
+                                    [batch_id],
+                                ]
+                            },
+                            "status": {"$cond": [is_active, "$status", PENDING]},
+                            "attempts": {"$cond": [is_active, "$attempts", 0]},
+                            "next_run_at": {"$cond": [is_active, "$next_run_at", now]},
+                            "finished_at": {"$cond": [is_active, "$finished_at", None]},
+                            "created_at": {"$ifNull": ["$created_at", now]},
+                            "updated_at": now,
+                        }
+                    }
+                ],
+                upsert=True,
+            )
+            for job_id, (link, file_id) in job_ids.items()
+        ]
+        await self.batches.insert_one(
+            {
+                "_id": batch_id,
+                "chat_id": chat_id,
+                "message_id": message_id,
+                "header": header,
+                "footer": footer,
+                "labels": labels or {},
+                "job_ids": list(job_ids),
+                "notified": False,
+                "created_at": now,
+            }
+        )
+        if operations:
+            try:
+                await self.jobs.bulk_write(operations, ordered=False)
+            except Exception:
+                # Batch without its jobs would never be finished.
+                # Jobs written before the error finish without the batch
+                await self.batches.delete_one({"_id": batch_id})
+                raise
+        for listener in self.listeners:
+            listener.set()
+        return batch_id
+
+    async def lease(self, limit: int, lease_seconds: float) -> list[dict]:
+        """
+        Takes up to limit jobs that are due and not leased by another worker
+
+        :param limit: Maximum amount of jobs
+        :param lease_seconds: Seconds the jobs belong to this worker
+        :return: Leased jobs
+        """
+        now = datetime.now(timezone.utc)
+        available = {
+            "status": {"$in": ACTIVE_STATUSES},
+            "next_run_at": {"$lte": now},
+            "lease_until": {"$not": {"$gt": now}},
+        }
+        candidates = await (
+            self.jobs.find(available, {"_id": 1})
+            .sort("next_run_at", 1)
+            .limit(limit)
+            .to_list(limit)
+        )
+        if not candidates:
+            return []
+        lease_id = uuid.uuid4().hex
+        await self.jobs.update_many(
+            {"_id": {"$in": [job["_id"] for job in candidates]}, **available},
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "lease_id": lease_id,
+                    "lease_until": now + timedelta(seconds=lease_seconds),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+        )
+        return await self.jobs.find({"lease_id": lease_id}).to_list(limit)
+
+    async def extend_lease(self, lease_id: str, lease_seconds: float) -> None:
+        """
+        Keeps unfinished jobs of the lease owned by the worker,
+        so they are not leased again while the worker is still sending them
+
+        :param lease_id: ID of the lease
+        :param lease_seconds: Seconds from now the jobs belong to the worker
+        :return: None
+        """
+        now = datetime.now(timezone.utc)
+        await self.jobs.update_many(
+            {"lease_id": lease_id, "status": RUNNING},
+            {"$set": {"lease_until": now + timedelta(seconds=lease_seconds)}},
+        )
+
+    async def complete(self, job: dict, result: str) -> list[str]:
+        return await self._finish(job, DONE, result)
+
+    async def fail(self, job: dict, result: str) -> list[str]:
+        return await self._finish(job, FAILED, result)
+
+    async def _finish(self, job: dict, status: str, result: str) -> list[str]:
+        """
+        Stores the result of the job if it is still leased by the worker
+
+        :param job: Leased job
+        :param status: DONE or FAILED
+        :param result: Text of the result shown to the user
+        :return: IDs of the batches waiting for the job, including the ones
+            that joined it after it was leased
+        """
+        now = datetime.now(timezone.utc)
+        document = await self.jobs.find_one_and_update(
+            {"_id": job["_id"], "lease_id": job["lease_id"]},
+            {
+                "$set": {
+                    "status": status,
+                    "result": result,
+                    "finished_at": now,
+                    "lease_until": None,
+                    "updated_at": now,
+                }
+            },
+            projection={"batch_ids": 1},
+        )
+        return document.get("batch_ids", []) if document else []
+
+    async def retry(self, job: dict, error: str, delay: float) -> None:
+        """
+        Returns the job to the queue after the delay
+
+        :param job: Leased job
+        :param error: Error of the attempt
+        :param delay: Seconds to wait before the next attempt
+        :return: None
+        """
+        now = datetime.now(timezone.utc)
+        await self.jobs.update_one(
+            {"_id": job["_id"], "lease_id": job["lease_id"]},
+            {
+                "$set": {
+                    "status": PENDING,
+                    "error": error,
+                    "next_run_at": now + timedelta(seconds=delay),
+                    "lease_until": None,
+                    "updated_at": now,
+                }
+            },
+        )
+
+    async def claim_finished_batch(
+        self, batch_id: str
+    ) -> tuple[dict, list[dict]] | None:
+        """
+        Marks the batch as notified if all its jobs are finished.
+        Only one worker succeeds in claiming the batch
+
+        :param batch_id: ID of the batch
+        :return: Batch and its jobs or None if it is not finished or already claimed
+        """
+        batch = await self.batches.find_one({"_id": batch_id, "notified": False})
+        if batch is None:
+            return None
+        active = await self.jobs.count_documents(
+            {"_id": {"$in": batch["job_ids"]}, "status": {"$in": ACTIVE_STATUSES}}
+        )
+        if active:
+            return None
+        batch = await self.batches.find_one_and_update(
+            {"_id": batch_id, "notified": False},
+            {"$set": {"notified": True}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if batch is None:
+            return None
+        jobs = await self.jobs.find({"_id": {"$in": batch["job_ids"]}}).to_list(None)
+        jobs_by_id = {job["_id"]: job for job in jobs}
+        return batch, [
+            jobs_by_id[job_id] for job_id in batch["job_ids"] if job_id in jobs_by_id
+        ]
+
+    async def claim_progress(
+        self, batch_id: str, interval: float
+    ) -> tuple[dict, int] | None:
+        """
+        Returns progress of unfinished batch at most once per interval
+
+        :param batch_id: ID of the batch
+        :param interval: Minimum seconds between progress reports
+        :return: Batch and amount of finished jobs or None if it is not time to report
+        """
+        now = datetime.now(timezone.utc)
+        batch = await self.batches.find_one_and_update(
+            {
+                "_id": batch_id,
+                "notified": False,
+                "progress_at": {"$not": {"$gt": now - timedelta(seconds=interval)}},
+            },
+            {"$set": {"progress_at": now}},
+        )
+        if batch is None:
+            return None
+        finished = await self.jobs.count_documents(
+            {"_id": {"$in": batch["job_ids"]}, "status": {"$nin": ACTIVE_STATUSES}}
+        )
+        return batch, finished
+
+    async def unnotified_batch_ids(self) -> list[str]:
+        batches = await self.batches.find({"notified": False}, {"_id": 1}).to_list(None)
+        return [batch["_id"] for batch in batches]
@@ -0,0 +1,294 @@
+import json
+import logging
+from typing import AsyncIterator
+
+from aiogram import Bot
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DeleteOne, ReturnDocument, UpdateOne
+from pymongo.results import BulkWriteResult
+
+from client.mongo_client.cache import UserCache
+from client.mongo_client.indexes import (
+    IndexReport,
+    async_ensure_indexes,
+    load_index_specs,
+)
+from client.mongo_client.models import USER_PROJECTION, UserDocument
+from utils.utils import setup_logger
+
+
+class AsyncMongoUsersClient:
+    """
+    Asyncio representation of MongoUsersClient that is working directly with user collection.
+    Built on top of motor, so every method is a coroutine and does not block the event loop.
+    If cache is provided, lookups by _id and username are served from it and every write
+    goes through it. Logging is done using telegram bot
+    """
+
+    def __init__(
+        self,
+        bot_: Bot,
+        chat_id: str | int,
+        host: str,
+        port: int | None,
+        _username: str | None,
+        _password: str | None,
+        _authSource: str | None,
+        database_name: str,
+        cache: UserCache | None = None,
+    ):
+        self.client = AsyncIOMotorClient(
+            host, port, username=_username, password=_password, authSource=_authSource
+        )
+        self.db = self.client[database_name]
+        self.users_collection = self.db.users
+        self.cache = cache
+        self.bot = bot_
+        self.chat_id = chat_id
+        self.logger = logging.getLogger(__name__)
+        setup_logger(self.logger, self.bot, self.chat_id, logging.WARNING)
+
+    async def setup(self) -> None:
+        """
+        Prepares users' collection. Should be awaited once before the bot starts polling,
+        as motor can not do any I/O while the module is being imported
+
+        :return: None
+        """
+        await self.initialize_user_collection()
+        await self.set_validation_schema()
+        await self.ensure_indexes()
+
+    async def initialize_user_collection(self):
+        required_collection = "users"
+        if required_collection not in await self.db.list_collection_names():
+            await self.db.create_collection(required_collection)
+
+    async def set_validation_schema(self):
+        """
+        Set or update the validation schema for the users' collection.
+        """
+        with open("client/mongo_client/validation_schema.json", "r") as file:
+            validation_schema = json.load(file)
+        await self.db.command({"collMod": "users", "validator": validation_schema})
+
+    async def ensure_indexes(self) -> IndexReport:
+        """
+        Creates missing indexes of users' collection described in indexes.json.
+        Logs the indexes that differ from the spec
+
+        :return: Report of the reconciliation
+        """
+        report = await async_ensure_indexes(
+            self.users_collection, load_index_specs("users")
+        )
+        if report.is_consistent:
+            self.logger.info(str(report))
+        else:
+            self.logger.warning(str(report))
+        return report
+
+    async def get_data(self, query: dict, *args) -> list:
+        """
+        Query MongoDB
+
+        :param query: Query to be sent to MongoDB
+        :param args: Query arguments
+        :return: List containing MongoDB data
+        """
+        documents = []
+        async for document in self.users_collection.find(query, *args):
+            documents.append(document)
+        return documents
+
+    async def iter_registered_user_ids(
+        self, after_id: int | None = None, batch_size: int = 500
+    ) -> AsyncIterator[int]:
+        """
+        Streams IDs of registered users in ascending order with a cursor,
+        so the whole collection is never loaded into memory
+
+        :param after_id: Only users with bigger ID are returned, used to resume
+        :param batch_size: Documents fetched from MongoDB per round trip
+        :return: Async iterator of user IDs
+        """
+        query = {"status": "registered"}
+        if after_id is not None:
+            query["_id"] = {"$gt": after_id}
+        cursor = (
+            self.users_collection.find(query, {"_id": 1})
+            .sort("_id", 1)
+            .batch_size(batch_size)
+        )
+        async for document in cursor:
+            yield document["_id"]
+
+    async def get_user_data(
+        self, value: int | str, filter_: str = "_id"
+    ) -> UserDocument | None:
+        """
+        Returns all the data about the user.
+        By default, searches by _id
+
+        :param filter_: Column to apply filter by default it is _id column
+        :param value: Data to search in the database
+        :return: User's data
+        """
+        use_cache = self.cache is not None and self.cache.is_cacheable(filter_)
+        if use_cache:
+            user_data = self.cache.get(value, filter_)
+            if user_data is not None:
+                return user_data
+        user_data = await self.users_collection.find_one(
+            {filter_: value}, USER_PROJECTION
+        )
+        if use_cache and user_data is not None:
+            self.cache.put(user_data)
+        return user_data
+
+    async def get_username(self, value: int | str, filter_: str = "_id") -> str | None:
+        """
+        Returns the username of specific user
+
+        :param filter_: Column to apply filter by default it is _id column
+        :param value: Data to search in the database
+        :return: Username or None if the user was not found
+        """
+        user_data = await self.get_user_data(value, filter_)
+        if user_data is None:
+            return None
+        return user_data.get("username")
+
+    async def add_user(self, user_id: int, data_: dict):
+        """
+        Adds the user to database
+
+        :param user_id: Unique id of user
+        :param data_: Message that contains information to update the user
+        :return: None
+        """
+        document = {
+            "_id": user_id,
+            "username": data_.get("username"),
+            "role": data_.get("role"),
+            "email": data_.get("email"),
+            "status": data_.get("status"),
+        }
+        try:
+            await self.users_collection.insert_one(document)
+            if self.cache is not None:
+                self.cache.put(document)
+            self.logger.info(
+                f"Added the user with parameters:\n"
+                f"name: {data_.get('username')}\n"
+                f"id: {user_id}"
+            )
+        except Exception as e:
+            self.logger.error(
+                f"Error registering {user_id} with username: {data_.get('Username')} - {e}"
+            )
+
+    async def delete_user(
+        self, value: int | str, filter_: str = "_id"
+    ) -> UserDocument | None:
+        """
+        Deletes user from users_collection in a single round trip
+
+        :param filter_: Column to apply filter by default it is _id column
+        :param value: Data to search in the database
+        :return: Deleted user's data or None if the user was not found
+        """
+        user_data = await self.users_collection.find_one_and_delete(
+            {filter_: value}, projection=USER_PROJECTION
+        )
+        if self.cache is not None:
+            self.cache.invalidate(value, filter_)
+        if user_data is None:
+            self.logger.warning(f"User with {filter_}: {value} was not found to delete")
+            return None
+        if self.cache is not None:
+            self.cache.invalidate(user_data["_id"])
+        self.logger.info(
+            f"Information about {user_data.get('username')} was deleted from database"
+        )
+        return user_data
+
+    async def update_user(
+        self, user_id: int, update: dict, upsert=False
+    ) -> UserDocument | None:
+        """
+        Updates users information if _id is found in a single round trip.
+
+        :param user_id: Unique id of user
+        :param update: Information to update that should be specified in {}
+        :param upsert: If upsert is True and no documents match the filter, a new document will be created.
+        If upsert is False and no documents match the filter, no action will be taken.
+        :type upsert: True or False
+        :return: Updated user's data or None if the user was not found
+        """
+        user_data = await self.users_collection.find_one_and_update(
+            {"_id": user_id},
+            {"$set": update},
+            projection=USER_PROJECTION,
+            upsert=upsert,
+            return_document=ReturnDocument.AFTER,
+        )
+        if user_data is None:
+            if self.cache is not None:
+                self.cache.invalidate(user_id)
+            self.logger.warning(f"User with _id: {user_id} was not found to update")
+            return None
+        if self.cache is not None:
+            self.cache.put(user_data)
+        self.logger.warning(
+            f"Information about {user_data.get('username')} was changed to {update}"
+        )
+        return user_data
+
+    async def update_users(
+        self, updates: dict[int, dict], upsert=False
+    ) -> BulkWriteResult | None:
+        """
+        Updates information of many users with one bulk write
+
+        :param updates: Mapping of user's _id to information to update
+        :param upsert: If upsert is True, missing users will be created
+        :return: Result of bulk write or None if there was nothing to update
+        """
+        if not updates:
+            return None
+        requests = [
+            UpdateOne({"_id": user_id}, {"$set": update}, upsert=upsert)
+            for user_id, update in updates.items()
+        ]
+        result = await self.users_collection.bulk_write(requests, ordered=False)
+        if self.cache is not None:
+            for user_id in updates:
+                self.cache.invalidate(user_id)
+        self.logger.warning(
+            f"Information about {result.modified_count} users was changed: {updates}"
+        )
+        return result
+
+    async def delete_users(
+        self, values: list[int | str], filter_: str = "_id"
+    ) -> BulkWriteResult | None:
+        """
+        Deletes many users from users_collection with one bulk write
+
+        :param values: Data to search in the database
+        :param filter_: Column to apply filter by default it is _id column
+        :return: Result of bulk write or None if there was nothing to delete
+        """
+        if not values:
+            return None
+        requests = [DeleteOne({filter_: value}) for value in values]
+        result = await self.users_collection.bulk_write(requests, ordered=False)
+        if self.cache is not None:
+            for value in values:
+                self.cache.invalidate(value, filter_)
+        self.logger.info(
+            f"{result.deleted_count} users were deleted from database "
+            f"by {filter_}: {values}"
+        )
+        return result
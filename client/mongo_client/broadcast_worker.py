@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError
+
+from bot.outgoing_scheduler import MessagePriority, outgoing_priority
+from client.mongo_client.async_client import AsyncMongoUsersClient
+from client.mongo_client.broadcasts import FINISHED, BroadcastStore
+from utils.utils import setup_logger
+
+
+class BroadcastWorker:
+    """
+    Sends broadcasts to all registered users.
+    Users are streamed from MongoDB and sent to in chunks by a limited amount
+    of concurrent senders. Messages have broadcast priority, so the outgoing
+    scheduler paces them and sends replies to users first.
+    Progress is checkpointed after every chunk and shown to the admin
+    who started the broadcast
+    """
+
+    def __init__(
+        self,
+        store: BroadcastStore,
+        mongo_client: AsyncMongoUsersClient,
+        bot_: Bot,
+        chat_id: str | int,
+        concurrency: int = 10,
+        chunk_size: int = 100,
+        progress_interval: float = 5,
+    ):
+        """
+        :param store: Store of the broadcasts and their checkpoints
+        :param mongo_client: Client to stream the users with
+        :param concurrency: Messages being sent at the same time by all broadcasts
+        :param chunk_size: Users processed between two checkpoints
+        :param progress_interval: Seconds between updates of the summary
+        """
+        self.store = store
+        self.mongo_client = mongo_client
+        self.bot = bot_
+        self.chat_id = chat_id
+        self.chunk_size = chunk_size
+        self.progress_interval = progress_interval
+        self.senders = asyncio.Semaphore(concurrency)
+        self.tasks: dict[str, asyncio.Task] = {}
+        self.logger = logging.getLogger(__name__)
+        setup_logger(self.logger, self.bot, self.chat_id, logging.WARNING)
+
+    async def resume(self) -> None:
+        """
+        Continues broadcasts interrupted by restart
+
+        :return: None
+        """
+        for broadcast in await self.store.unfinished():
+            self.logger.info(
+                f"Broadcast {broadcast['_id']} is resumed "
+                f"after user {broadcast['last_user_id']}"
+            )
+            self.start(broadcast)
+
+    def start(self, broadcast: dict) -> asyncio.Task:
+        """
+        Starts sending the broadcast in background
+
+        :param broadcast: Document of the broadcast
+        :return: Task of the broadcast
+        """
+        broadcast_id = broadcast["_id"]
+        with outgoing_priority(MessagePriority.BROADCAST):
+            task = asyncio.create_task(self.run(broadcast))
+        self.tasks[broadcast_id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(broadcast_id, None))
+        return task
+
+    async def stop(self) -> None:
+        """
+        Cancels running broadcasts, they are resumed from the checkpoint after restart
+
+        :return: None
+        """
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run(self, broadcast: dict) -> None:
+        """
+        Sends the broadcast to users after its checkpoint.
+        Failed broadcast stays unfinished and is resumed after restart
+
+        :param broadcast: Document of the broadcast
+        :return: None
+        """
+        reported_at = time.monotonic()
+        chunk = []
+        try:
+            async for user_id in self.mongo_client.iter_registered_user_ids(
+                broadcast["last_user_id"]
+            ):
+                chunk.append(user_id)
+                if len(chunk) < self.chunk_size:
+                    continue
+                broadcast = await self.process(broadcast, chunk)
+                chunk = []
+                if time.monotonic() - reported_at > self.progress_interval:
+                    reported_at = time.monotonic()
+                    await self.report(broadcast)
+            if chunk:
+                broadcast = await self.process(broadcast, chunk)
+            broadcast = await self.store.finish(broadcast["_id"])
+            await self.report(broadcast)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            self.logger.error(f"Broadcast {broadcast['_id']} stopped: {error}")
+
+    async def process(self, broadcast: dict, user_ids: list[int]) -> dict:
+        """
+        Sends the broadcast to the chunk of users and stores the checkpoint
+
+        :param broadcast: Document of the broadcast
+        :param user_ids: IDs of users in ascending order
+        :return: Updated document of the broadcast
+        """
+        results = await asyncio.gather(
+            *(self.send(user_id, broadcast["text"]) for user_id in user_ids)
+        )
+        return await self.store.checkpoint(
+            broadcast["_id"], user_ids[-1], Counter(results)
+        )
+
+    async def send(self, user_id: int, text: str) -> str:
+        """
+        :param user_id: ID of the user, which is the ID of their private chat
+        :param text: Text of the broadcast
+        :return: delivered, blocked or failed
+        """
+        async with self.senders:
+            try:
+                await self.bot.send_message(user_id, text)
+                return "delivered"
+            except TelegramForbiddenError:
+                return "blocked"
+            except TelegramAPIError as error:
+                self.logger.debug(f"Can not send broadcast to {user_id}: {error}")
+                return "failed"
+
+    async def report(self, broadcast: dict) -> None:
+        """
+        Edits the summary of the broadcast shown to the admin
+
+        :param broadcast: Document of the broadcast
+        :return: None
+        """
+        try:
+            # The admin waits for the summary, so it is not queued behind the broadcast
+            with outgoing_priority(MessagePriority.INTERACTIVE):
+                await self.bot.edit_message_text(
+                    self.render(broadcast),
+                    chat_id=broadcast["chat_id"],
+                    message_id=broadcast["message_id"],
+                )
+        except TelegramAPIError as error:
+            self.logger.warning(f"Can not report broadcast {broadcast['_id']}: {error}")
+
+    @staticmethod
+    def render(broadcast: dict) -> str:
+        if broadcast["status"] == FINISHED:
+            header = "Broadcast finished"
+        else:
+            header = "Broadcast is in progress..."
+        return (
+            f"{header}\n\n"
+            f"Delivered: {broadcast['delivered']}\n"
+            f"Failed: {broadcast['failed']}\n"
+            f"Blocked: {broadcast['blocked']}"
+        )
@@ -0,0 +1,82 @@
+import uuid
+from datetime import datetime, timezone
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReturnDocument
+
+RUNNING = "running"
+FINISHED = "finished"
+COUNTERS = ("delivered", "failed", "blocked")
+
+
+class BroadcastStore:
+    """
+    Broadcasts kept in MongoDB with their checkpoint.
+    Users are sent to in ascending order of their ID, the checkpoint is the ID
+    of the last user before which everyone was processed, so an interrupted
+    broadcast continues after it
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection):
+        """
+        :param collection: Collection to keep the broadcasts in
+        """
+        self.collection = collection
+
+    async def create(self, text: str, chat_id: int | str, message_id: int) -> dict:
+        """
+        Records new broadcast
+
+        :param text: Text sent to the users
+        :param chat_id: Chat of the admin who started the broadcast
+        :param message_id: Message edited with the summary
+        :return: Document of the broadcast
+        """
+        now = datetime.now(timezone.utc)
+        broadcast = {
+            "_id": uuid.uuid4().hex,
+            "text": text,
+            "chat_id": chat_id,
+            "message_id": message_id,
+            "status": RUNNING,
+            "last_user_id": None,
+            **{counter: 0 for counter in COUNTERS},
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self.collection.insert_one(broadcast)
+        return broadcast
+
+    async def checkpoint(
+        self, broadcast_id: str, last_user_id: int, counts: dict[str, int]
+    ) -> dict:
+        """
+        Stores the progress of processed users
+
+        :param broadcast_id: ID of the broadcast
+        :param last_user_id: ID of the last processed user
+        :param counts: Amount of delivered, failed and blocked since last checkpoint
+        :return: Updated document of the broadcast
+        """
+        return await self.collection.find_one_and_update(
+            {"_id": broadcast_id},
+            {
+                "$set": {
+                    "last_user_id": last_user_id,
+                    "updated_at": datetime.now(timezone.utc),
+                },
+                "$inc": {counter: counts.get(counter, 0) for counter in COUNTERS},
+            },
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def finish(self, broadcast_id: str) -> dict:
+        now = datetime.now(timezone.utc)
+        return await self.collection.find_one_and_update(
+            {"_id": broadcast_id},
+            {"$set": {"status": FINISHED, "finished_at": now, "updated_at": now}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def unfinished(self) -> list[dict]:
+        return await self.collection.find({"status": RUNNING}).to_list(None)
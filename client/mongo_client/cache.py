@@ -0,0 +1,115 @@
+from cachetools import TTLCache
+
+
+class UserCache:
+    """
+    Bounded in-process cache of user documents with TTL and LRU eviction.
+    Documents are stored by _id, lookups by username are resolved through a secondary index.
+    Only _id and username filters are cacheable, any other filter always goes to MongoDB
+    """
+
+    CACHEABLE_FILTERS = ("_id", "username")
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        """
+        :param maxsize: Maximum amount of user documents to keep
+        :param ttl: Time in seconds after which a document is considered stale
+        """
+        self._users = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._usernames: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def is_cacheable(self, filter_: str) -> bool:
+        return filter_ in self.CACHEABLE_FILTERS
+
+    def get(self, value: int | str, filter_: str = "_id") -> dict | None:
+        """
+        Returns a copy of cached user document and updates hit/miss counters
+
+        :param value: Data to search in the cache
+        :param filter_: Column to apply filter by default it is _id column
+        :return: User's data or None if there is no fresh document
+        """
+        user_id = self._usernames.get(value) if filter_ == "username" else value
+        document = self._users.get(user_id) if user_id is not None else None
+        if document is not None and document.get(filter_) != value:
+            document = None
+        if document is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return document.copy()
+
+    def put(self, document: dict) -> None:
+        """
+        Stores the user document, replacing the previous version of it
+
+        :param document: User's data, should contain _id
+        :return: None
+        """
+        user_id = document["_id"]
+        previous = self._users.get(user_id)
+        username = document.get("username")
+        if previous is not None and previous.get("username") != username:
+            self._usernames.pop(previous.get("username"), None)
+        self._users[user_id] = document.copy()
+        if username is not None:
+            self._usernames[username] = user_id
+        if len(self._usernames) > self._users.maxsize:
+            self._prune_usernames()
+
+    def refresh(self, document: dict) -> None:
+        """
+        Replaces the user document only if it is already cached.
+        Used for updates that come from outside, so they do not pollute the cache
+
+        :param document: User's data, should contain _id
+        :return: None
+        """
+        if document["_id"] in self._users:
+            self.put(document)
+
+    def invalidate(self, value: int | str, filter_: str = "_id") -> None:
+        """
+        Removes the user document from the cache
+
+        :param value: Data to search in the cache
+        :param filter_: Column to apply filter by default it is _id column
+        :return: None
+        """
+        user_id = self._usernames.pop(value, None) if filter_ == "username" else value
+        if user_id is None:
+            return
+        document = self._users.pop(user_id, None)
+        if document is not None:
+            self._usernames.pop(document.get("username"), None)
+
+    def clear(self) -> None:
+        self._users.clear()
+        self._usernames.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns the counters of the cache
+
+        :return: Dictionary with hits, misses, current size and hit ratio
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._users),
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+    def _prune_usernames(self) -> None:
+        """Drops usernames which point to expired or evicted documents"""
+        self._usernames = {
+            document["username"]: user_id
+            for user_id, document in self._users.items()
+            if document.get("username") is not None
+        }
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+
+from aiogram import Bot
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import OperationFailure, PyMongoError
+
+from client.mongo_client.cache import UserCache
+from utils.utils import setup_logger
+
+# Server error codes that make the stored resume token useless
+CHANGE_STREAM_HISTORY_LOST = 286
+INVALID_RESUME_TOKEN = 260
+# Change streams are available only on replica sets and sharded clusters
+CHANGE_STREAM_NOT_SUPPORTED = 40573
+
+
+class UserChangeStreamWatcher:
+    """
+    Tails the change stream of users' collection and keeps UserCache consistent with
+    the edits made by other bot replicas or directly in MongoDB.
+    Keeps the last resume token, so after a network error the stream continues
+    from the same place without flushing the cache
+    """
+
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection,
+        cache: UserCache,
+        bot_: Bot,
+        chat_id: str | int,
+        reconnect_delay: float = 5,
+    ):
+        self.collection = collection
+        self.cache = cache
+        self.reconnect_delay = reconnect_delay
+        self.resume_token: dict | None = None
+        self.bot = bot_
+        self.chat_id = chat_id
+        self.logger = logging.getLogger(__name__)
+        setup_logger(self.logger, self.bot, self.chat_id, logging.WARNING)
+
+    async def run(self) -> None:
+        """
+        Watches the collection until cancelled, reconnecting after errors
+
+        :return: None
+        """
+        connected_before = False
+        while True:
+            if connected_before and self.resume_token is None:
+                # Some changes could be missed while there was no stream to resume from
+                self.cache.clear()
+            try:
+                connected_before = True
+                await self.watch()
+            except OperationFailure as error:
+                if error.code == CHANGE_STREAM_NOT_SUPPORTED:
+                    self.logger.warning(
+                        f"Change streams are not supported by MongoDB, "
+                        f"user cache relies on TTL only: {error}"
+                    )
+                    return
+                if error.code in (CHANGE_STREAM_HISTORY_LOST, INVALID_RESUME_TOKEN):
+                    self.logger.warning(f"Can not resume users change stream: {error}")
+                    self.resume_token = None
+                    continue
+                self.logger.error(f"Users change stream failed: {error}")
+            except PyMongoError as error:
+                self.logger.error(f"Users change stream failed: {error}")
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def watch(self) -> None:
+        """
+        Opens the change stream and applies every change to the cache.
+        The resume token is saved after each batch, even if it was empty
+
+        :return: None
+        """
+        async with self.collection.watch(
+            full_document="updateLookup", resume_after=self.resume_token
+        ) as stream:
+            while stream.alive:
+                change = await stream.try_next()
+                self.resume_token = stream.resume_token
+                if change is not None:
+                    self.apply_change(change)
+
+    def apply_change(self, change: dict) -> None:
+        """
+        Refreshes or evicts the cached user document affected by the change
+
+        :param change: Change event received from MongoDB
+        :return: None
+        """
+        operation = change.get("operationType")
+        if operation in ("insert", "update", "replace"):
+            document = change.get("fullDocument")
+            if document is not None:
+                self.cache.refresh(document)
+            else:
+                # Document was deleted before the lookup happened
+                self.cache.invalidate(change["documentKey"]["_id"])
+        elif operation == "delete":
+            self.cache.invalidate(change["documentKey"]["_id"])
+        elif operation in ("drop", "rename", "dropDatabase", "invalidate"):
+            self.cache.clear()
+            # Stream can not be resumed after invalidate event
+            self.resume_token = None
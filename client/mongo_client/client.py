@@ -2,10 +2,11 @@ import json
 import logging
 
 from aiogram import Bot
-from pymongo import MongoClient, ReturnDocument
+from pymongo import DeleteOne, MongoClient, ReturnDocument, UpdateOne
+from pymongo.results import BulkWriteResult
 
-from bot.bot import bot
-from settings import settings
+from client.mongo_client.indexes import IndexReport, ensure_indexes, load_index_specs
+from client.mongo_client.models import USER_PROJECTION
 from utils.utils import setup_logger
 from exceptions.exceptions import _BaseException
 
@@ -54,6 +55,20 @@ class MongoUsersClient:
             validation_schema = json.load(file)
         self.db.command({"collMod": "users", "validator": validation_schema})
 
+    def ensure_indexes(self) -> IndexReport:
+        """
+        Creates missing indexes of users' collection described in indexes.json.
+        Logs the indexes that differ from the spec
+
+        :return: Report of the reconciliation
+        """
+        report = ensure_indexes(self.users_collection, load_index_specs("users"))
+        if report.is_consistent:
+            self.logger.info(str(report))
+        else:
+            self.logger.warning(str(report))
+        return report
+
     def get_data(self, query: dict, *args) -> list:
         """
         Query MongoDB
@@ -87,9 +102,12 @@ class MongoUsersClient:
 
         :param filter_: Column to apply filter by default it is _id column
         :param value: Data to search in the database
+        :return: Username or None if the user was not found
         """
-        username = self.users_collection.find_one({filter_: value}).get("username")
-        return username
+        user_data = self.users_collection.find_one({filter_: value}, {"username": 1})
+        if user_data is None:
+            return None
+        return user_data.get("username")
 
     def add_user(self, user_id: int, data_: dict):
         """
@@ -119,46 +137,90 @@ class MongoUsersClient:
                 f"Error registering {user_id} with username: {data_.get('Username')} - {e}"
             )
 
-    def delete_user(self, value: int | str, filter_: str = "_id"):
+    def delete_user(self, value: int | str, filter_: str = "_id") -> dict | None:
         """
-        Deletes user from users_collection
+        Deletes user from users_collection in a single round trip
 
         :param filter_: Column to apply filter by default it is _id column
         :param value: Data to search in the database
-        :return: None
+        :return: Deleted user's data or None if the user was not found
         """
-        username = self.get_username(value, filter_)
-        self.users_collection.find_one_and_delete(
-            {filter_: value}, return_document=ReturnDocument.BEFORE
+        user_data = self.users_collection.find_one_and_delete(
+            {filter_: value}, projection=USER_PROJECTION
         )
-        self.logger.info(f"Information about {username} was deleted from database")
+        if user_data is None:
+            self.logger.warning(f"User with {filter_}: {value} was not found to delete")
+            return None
+        self.logger.info(
+            f"Information about {user_data.get('username')} was deleted from database"
+        )
+        return user_data
 
-    def update_user(self, user_id: int, update: dict, upsert=False) -> None:
+    def update_user(self, user_id: int, update: dict, upsert=False) -> dict | None:
         """
-        Updates users information if _id is found.
+        Updates users information if _id is found in a single round trip.
 
         :param user_id: Unique id of user
         :param update: Information to update that should be specified in {}
         :param upsert: If upsert is True and no documents match the filter, a new document will be created.
         If upsert is False and no documents match the filter, no action will be taken.
         :type upsert: True or False
+        :return: Updated user's data or None if the user was not found
         """
-        username = self.get_username(user_id)
-        self.users_collection.find_one_and_update(
+        user_data = self.users_collection.find_one_and_update(
             {"_id": user_id},
             {"$set": update},
+            projection=USER_PROJECTION,
             upsert=upsert,
-            return_document=ReturnDocument.BEFORE,
+            return_document=ReturnDocument.AFTER,
+        )
+        if user_data is None:
+            self.logger.warning(f"User with _id: {user_id} was not found to update")
+            return None
+        self.logger.warning(
+            f"Information about {user_data.get('username')} was changed to {update}"
+        )
+        return user_data
+
+    def update_users(
+        self, updates: dict[int, dict], upsert=False
+    ) -> BulkWriteResult | None:
+        """
+        Updates information of many users with one bulk write
+
+        :param updates: Mapping of user's _id to information to update
+        :param upsert: If upsert is True, missing users will be created
+        :return: Result of bulk write or None if there was nothing to update
+        """
+        if not updates:
+            return None
+        requests = [
+            UpdateOne({"_id": user_id}, {"$set": update}, upsert=upsert)
+            for user_id, update in updates.items()
+        ]
+        result = self.users_collection.bulk_write(requests, ordered=False)
+        self.logger.warning(
+            f"Information about {result.modified_count} users was changed: {updates}"
         )
-        self.logger.warning(f"Information about {username} was changed to {update}")
+        return result
 
+    def delete_users(
+        self, values: list[int | str], filter_: str = "_id"
+    ) -> BulkWriteResult | None:
+        """
+        Deletes many users from users_collection with one bulk write
 
-MONGO_HOST = settings.mongo_host
-MONGO_PORT = settings.mongo_port
-_username = settings.mongo_username
-_password = settings.mongo_password
-author_chat_id = settings.author_chat_id
-mongo_client = MongoUsersClient(
-    bot, author_chat_id, MONGO_HOST, MONGO_PORT, _username, _password, "admin", "db"
-)
+        :param values: Data to search in the database
+        :param filter_: Column to apply filter by default it is _id column
+        :return: Result of bulk write or None if there was nothing to delete
+        """
+        if not values:
+            return None
+        requests = [DeleteOne({filter_: value}) for value in values]
+        result = self.users_collection.bulk_write(requests, ordered=False)
+        self.logger.info(
+            f"{result.deleted_count} users were deleted from database "
+            f"by {filter_}: {values}"
+        )
+        return result
 
@@ -0,0 +1,129 @@
+from datetime import datetime, timezone
+from typing import Any
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from client.mongo_client.indexes import IndexReport, IndexSpec, async_ensure_indexes
+
+
+class MongoStorage(BaseStorage):
+    """
+    FSM storage that keeps state and data of each (bot, chat, user) key in MongoDB,
+    so flows survive restarts and can be shared by several bot processes.
+
+    Within an update the record is read once and every change is kept in memory.
+    flush() sends all of them as a single upsert and must be called once the handler
+    has finished, which is done by StorageFlushMiddleware.
+    Records that were not touched for state_ttl seconds are removed by TTL index
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection, state_ttl: int = 86400):
+        """
+        :param collection: Collection to keep the states in
+        :param state_ttl: Seconds after which an abandoned flow expires
+        """
+        self.collection = collection
+        self.state_ttl = state_ttl
+        self._records: dict[StorageKey, dict[str, Any]] = {}
+
+    async def setup(self) -> IndexReport:
+        """
+        Creates TTL index which expires abandoned flows
+
+        :return: Report of the reconciliation
+        """
+        spec = IndexSpec(
+            "updated_at_ttl",
+            (("updated_at", 1),),
+            expire_after_seconds=self.state_ttl,
+        )
+        return await async_ensure_indexes(self.collection, [spec])
+
+    @staticmethod
+    def document_id(key: StorageKey) -> str:
+        return (
+            f"{key.bot_id}:{key.chat_id}:{key.user_id}:"
+            f"{key.thread_id or ''}:{key.destiny}"
+        )
+
+    async def _load(self, key: StorageKey) -> dict[str, Any]:
+        """
+        Returns the record of the key, reading it from MongoDB only once per update
+
+        :param key: Storage key
+        :return: Record with state, data and the set of changed fields
+        """
+        record = self._records.get(key)
+        if record is None:
+            document = await self.collection.find_one(
+                {"_id": self.document_id(key)}, {"state": 1, "data": 1}
+            )
+            document = document or {}
+            record = {
+                "state": document.get("state"),
+                "data": document.get("data", {}),
+                "dirty": set(),
+            }
+            self._records[key] = record
+        return record
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._load(key)
+        record["state"] = state.state if isinstance(state, State) else state
+        record["dirty"].add("state")
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        record = await self._load(key)
+        return record["state"]
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        record = await self._load(key)
+        record["data"] = data.copy()
+        record["dirty"].add("data")
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        record = await self._load(key)
+        return record["data"].copy()
+
+    async def flush(self, key: StorageKey) -> None:
+        """
+        Writes all changes of the key made during the update with one request.
+        Cleared records are deleted instead of being stored empty
+
+        :param key: Storage key
+        :return: None
+        """
+        record = self._records.get(key)
+        if record is None:
+            return
+        dirty, record["dirty"] = record["dirty"], set()
+        try:
+            if dirty:
+                await self._write(key, record, dirty)
+        except BaseException:
+            record["dirty"] |= dirty
+            raise
+        finally:
+            # The record stays cached while it is written, so the next update reading
+            # the state before the events isolation lock never gets the old document
+            if self._records.get(key) is record and not record["dirty"]:
+                del self._records[key]
+
+    async def _write(
+        self, key: StorageKey, record: dict[str, Any], dirty: set[str]
+    ) -> None:
+        document_id = self.document_id(key)
+        if record["state"] is None and not record["data"]:
+            await self.collection.delete_one({"_id": document_id})
+            return
+        update = {field: record[field] for field in dirty}
+        update["updated_at"] = datetime.now(timezone.utc)
+        await self.collection.update_one(
+            {"_id": document_id}, {"$set": update}, upsert=True
+        )
+
+    async def close(self) -> None:
+        for key in list(self._records):
+            await self.flush(key)
@@ -0,0 +1,163 @@
+import json
+from dataclasses import dataclass, field
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import IndexModel
+from pymongo.collection import Collection
+from pymongo.errors import OperationFailure
+
+INDEXES_PATH = "client/mongo_client/indexes.json"
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """
+    Declarative description of a single index of the collection
+    """
+
+    name: str
+    keys: tuple[tuple[str, int], ...]
+    unique: bool = False
+    expire_after_seconds: int | None = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "IndexSpec":
+        return cls(
+            name=data["name"],
+            keys=tuple((key, direction) for key, direction in data["keys"]),
+            unique=data.get("unique", False),
+            expire_after_seconds=data.get("expireAfterSeconds"),
+        )
+
+    def to_index_model(self) -> IndexModel:
+        options = {"name": self.name, "unique": self.unique}
+        if self.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = self.expire_after_seconds
+        return IndexModel(list(self.keys), **options)
+
+    def matches(self, index_info: dict) -> bool:
+        """
+        Checks if existing index has the same definition as the spec
+
+        :param index_info: Index document returned by list_indexes
+        :return: bool
+        """
+        keys = tuple(
+            (key, direction if isinstance(direction, str) else int(direction))
+            for key, direction in index_info["key"].items()
+        )
+        return (
+            keys == self.keys
+            and index_info.get("unique", False) == self.unique
+            and index_info.get("expireAfterSeconds") == self.expire_after_seconds
+        )
+
+
+@dataclass
+class IndexReport:
+    """
+    Result of reconciling the collection indexes against the spec.
+    Indexes that differ from the spec or are not described in it are only reported,
+    they should be dropped by hand as it might be expensive to rebuild them
+    """
+
+    collection: str
+    created: list[str] = field(default_factory=list)
+    present: list[str] = field(default_factory=list)
+    mismatched: list[str] = field(default_factory=list)
+    extra: list[str] = field(default_factory=list)
+    failed: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def is_consistent(self) -> bool:
+        return not (self.mismatched or self.extra or self.failed)
+
+    def __str__(self) -> str:
+        return (
+            f"Indexes of {self.collection}: "
+            f"created {self.created}, present {self.present}, "
+            f"mismatched {self.mismatched}, extra {self.extra}, failed {self.failed}"
+        )
+
+
+def load_index_specs(collection_name: str, path: str = INDEXES_PATH) -> list[IndexSpec]:
+    """
+    Reads index specs of the collection from json file
+
+    :param collection_name: Name of collection in the json file
+    :param path: Path to the json file
+    :return: List of index specs
+    """
+    with open(path, "r") as file:
+        specs = json.load(file)
+    return [IndexSpec.from_dict(spec) for spec in specs.get(collection_name, [])]
+
+
+def compare_indexes(
+    collection_name: str, specs: list[IndexSpec], existing: list[dict]
+) -> tuple[IndexReport, list[IndexSpec]]:
+    """
+    Compares existing indexes with the specs
+
+    :param collection_name: Name of collection for the report
+    :param specs: Desired indexes
+    :param existing: Index documents returned by list_indexes
+    :return: Report and the list of specs that should be created
+    """
+    report = IndexReport(collection_name)
+    existing_by_name = {index["name"]: index for index in existing}
+    missing = []
+    for spec in specs:
+        index_info = existing_by_name.get(spec.name)
+        if index_info is None:
+            missing.append(spec)
+        elif spec.matches(index_info):
+            report.present.append(spec.name)
+        else:
+            report.mismatched.append(spec.name)
+    spec_names = {spec.name for spec in specs}
+    report.extra = [
+        name for name in existing_by_name if name != "_id_" and name not in spec_names
+    ]
+    return report, missing
+
+
+def ensure_indexes(collection: Collection, specs: list[IndexSpec]) -> IndexReport:
+    """
+    Idempotently creates missing indexes and reports the difference with the specs
+
+    :param collection: Collection to apply the specs to
+    :param specs: Desired indexes
+    :return: Report of the reconciliation
+    """
+    report, missing = compare_indexes(
+        collection.name, specs, list(collection.list_indexes())
+    )
+    for spec in missing:
+        try:
+            collection.create_indexes([spec.to_index_model()])
+            report.created.append(spec.name)
+        except OperationFailure as error:
+            report.failed[spec.name] = str(error)
+    return report
+
+
+async def async_ensure_indexes(
+    collection: AsyncIOMotorCollection, specs: list[IndexSpec]
+) -> IndexReport:
+    """
+    Asyncio version of ensure_indexes
+
+    :param collection: Collection to apply the specs to
+    :param specs: Desired indexes
+    :return: Report of the reconciliation
+    """
+    existing = [index async for index in collection.list_indexes()]
+    report, missing = compare_indexes(collection.name, specs, existing)
+    for spec in missing:
+        try:
+            await collection.create_indexes([spec.to_index_model()])
+            report.created.append(spec.name)
+        except OperationFailure as error:
+            report.failed[spec.name] = str(error)
+    return report
@@ -0,0 +1,17 @@
+from typing import TypedDict
+
+# Fields of the users' collection that are needed by the bot.
+# _id is returned by MongoDB by default
+USER_PROJECTION = {"username": 1, "role": 1, "email": 1, "status": 1}
+
+
+class UserDocument(TypedDict, total=False):
+    """
+    Document of users' collection. Follows validation_schema.json
+    """
+
+    _id: int
+    username: str
+    role: str | None
+    email: str
+    status: str | None
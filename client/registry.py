@@ -0,0 +1,230 @@
+import asyncio
+import json
+import logging
+import time
+from functools import cached_property
+from typing import Any, Awaitable, Callable
+
+from aiogram import Bot
+
+from bot.bot import bot, outgoing_scheduler
+from client.google_client.access_worker import AccessJobWorker
+from client.google_client.async_client import AsyncGoogleClient
+from client.google_client.client import GoogleClient
+from client.google_client.drive_sync import DriveSyncWorker
+from client.google_client.quota import QuotaScheduler
+from client.mongo_client.access_jobs import AccessJobQueue
+from client.mongo_client.async_client import AsyncMongoUsersClient
+from client.mongo_client.broadcast_worker import BroadcastWorker
+from client.mongo_client.broadcasts import BroadcastStore
+from client.mongo_client.cache import UserCache
+from client.mongo_client.client import MongoUsersClient
+from settings import settings
+from utils.utils import setup_logger
+
+
+class ClientRegistry:
+    """
+    Lazily constructs the clients used by the bot.
+    Nothing connects to MongoDB or Google APIs while modules are imported,
+    all the preparation is done by on_startup, which should be registered
+    as a startup hook of the dispatcher
+    """
+
+    def __init__(self, bot_: Bot, chat_id: str):
+        self.bot = bot_
+        self.chat_id = chat_id
+        self.startup_steps: list[tuple[str, Callable[[], Awaitable[Any]]]] = []
+        self.startup_timings: dict[str, float] = {}
+        self.logger = logging.getLogger(__name__)
+        setup_logger(self.logger, self.bot, self.chat_id)
+
+    @cached_property
+    def user_cache(self) -> UserCache:
+        return UserCache(settings.user_cache_size, settings.user_cache_ttl)
+
+    @cached_property
+    def mongo(self) -> AsyncMongoUsersClient:
+        return AsyncMongoUsersClient(
+            self.bot,
+            self.chat_id,
+            settings.mongo_host,
+            settings.mongo_port,
+            settings.mongo_username,
+            settings.mongo_password,
+            "admin",
+            "db",
+            cache=self.user_cache,
+        )
+
+    @cached_property
+    def sync_mongo(self) -> MongoUsersClient:
+        """
+        Blocking client for scripts. Connects as soon as it is accessed
+        """
+        return MongoUsersClient(
+            self.bot,
+            self.chat_id,
+            settings.mongo_host,
+            settings.mongo_port,
+            settings.mongo_username,
+            settings.mongo_password,
+            "admin",
+            "db",
+        )
+
+    @cached_property
+    def google(self) -> GoogleClient:
+        return GoogleClient(
+            self.bot,
+            self.chat_id,
+            settings.google_batch_concurrency,
+            settings.google_batch_max_retries,
+            QuotaScheduler(
+                {
+                    "drive": (settings.google_drive_qps, settings.google_drive_burst),
+                    "sheets": (
+                        settings.google_sheets_qps,
+                        settings.google_sheets_burst,
+                    ),
+                }
+            ),
+            settings.google_token_refresh_margin,
+            settings.get_clean_excluded_sheets(),
+        )
+
+    @cached_property
+    def async_google(self) -> AsyncGoogleClient:
+        return AsyncGoogleClient(self.google, settings.google_max_workers)
+
+    @cached_property
+    def drive_sync(self) -> DriveSyncWorker:
+        return DriveSyncWorker(
+            self.async_google,
+            self.mongo.db.drive_sync,
+            self.bot,
+            self.chat_id,
+            settings.drive_sync_interval,
+        )
+
+    @cached_property
+    def access_jobs(self) -> AccessJobQueue:
+        return AccessJobQueue(self.mongo.db.access_jobs, self.mongo.db.access_batches)
+
+    @cached_property
+    def access_worker(self) -> AccessJobWorker:
+        return AccessJobWorker(
+            self.access_jobs,
+            self.async_google,
+            self.bot,
+            self.chat_id,
+            concurrency=settings.access_job_workers,
+            max_attempts=settings.access_job_max_attempts,
+        )
+
+    @cached_property
+    def broadcasts(self) -> BroadcastStore:
+        return BroadcastStore(self.mongo.db.broadcasts)
+
+    @cached_property
+    def broadcast_worker(self) -> BroadcastWorker:
+        return BroadcastWorker(
+            self.broadcasts,
+            self.mongo,
+            self.bot,
+            self.chat_id,
+            concurrency=settings.broadcast_concurrency,
+        )
+
+    def add_startup_step(self, name: str, step: Callable[[], Awaitable[Any]]) -> None:
+        """
+        Registers the coroutine function to be awaited by on_startup
+
+        :param name: Name of the step in the timing report
+        :param step: Coroutine function without arguments
+        :return: None
+        """
+        self.startup_steps.append((name, step))
+
+    async def on_startup(self) -> None:
+        """
+        Prepares MongoDB collections and Google services, then runs the registered steps.
+        Blocking Google calls are done in worker threads, so the event loop stays free.
+        Logs how long each step took
+
+        :return: None
+        """
+        steps = [
+            ("mongo: users collection", self.mongo.initialize_user_collection),
+            ("mongo: validation schema", self.mongo.set_validation_schema),
+            ("mongo: indexes", self.mongo.ensure_indexes),
+            ("mongo: access jobs", self.access_jobs.setup),
+            ("google: credentials", self._load_google_credentials),
+            ("google: services", self.async_google.connect),
+            *self.startup_steps,
+        ]
+        for name, step in steps:
+            started_at = time.perf_counter()
+            await step()
+            self.startup_timings[name] = time.perf_counter() - started_at
+        self.logger.info(self.startup_report())
+
+    async def on_shutdown(self) -> None:
+        """
+        Stops the workers and closes the clients that were created.
+        Workers are stopped first, so they do not use the closed clients
+
+        :return: None
+        """
+        if "access_worker" in self.__dict__:
+            await self.access_worker.stop()
+        if "broadcast_worker" in self.__dict__:
+            await self.broadcast_worker.stop()
+        if "async_google" in self.__dict__:
+            self.async_google.close()
+        if "mongo" in self.__dict__:
+            self.mongo.client.close()
+
+    def metrics(self) -> dict[str, dict]:
+        """
+        Returns metrics of the clients that were created
+
+        :return: Mapping of client name to its metrics
+        """
+        metrics = {}
+        if "user_cache" in self.__dict__:
+            metrics["user_cache"] = self.user_cache.stats()
+        if "google" in self.__dict__:
+            metrics["google_quota"] = self.google.quota.metrics()
+        if "drive_sync" in self.__dict__:
+            metrics["drive_sync"] = self.drive_sync.metrics()
+        metrics["outgoing_scheduler"] = outgoing_scheduler.metrics()
+        return metrics
+
+    async def report_metrics(self, interval: float) -> None:
+        """
+        Logs metrics of the clients as one line every interval
+
+        :param interval: Seconds between the records, reporting is disabled if 0
+        :return: None
+        """
+        if interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(interval)
+            self.logger.info(f"Metrics: {json.dumps(self.metrics(), default=str)}")
+
+    def startup_report(self) -> str:
+        total = sum(self.startup_timings.values())
+        lines = [f"Startup finished in {total:.3f}s"]
+        lines.extend(
+            f"{name}: {duration:.3f}s"
+            for name, duration in self.startup_timings.items()
+        )
+        return "\n".join(lines)
+
+    async def _load_google_credentials(self) -> None:
+        await asyncio.to_thread(self.google.credential_manager.get)
+
+
+clients = ClientRegistry(bot, settings.author_chat_id)
@@ -1,41 +1,151 @@
 import asyncio
 
 from aiogram import Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import SimpleEventIsolation
 
 from bot.bot import bot
+from bot.bot_logging.logging_config import (
+    configure_logging,
+    start_logging,
+    stop_logging,
+)
+from bot.handlers.admin_broadcast_button import BroadcastRouter
 from bot.handlers.admin_delete_button import DeleteRouter
 from bot.handlers.cmd_cancel import CancelRouter
 from bot.handlers.cmd_me import MeRouter
 from bot.handlers.cmd_start import RegistrationRouter
 from bot.handlers.reply_button_handlers import ButtonHandlerRouter
-from client.google_client.client import google_client
-from client.mongo_client.client import mongo_client
+from bot.middlewares.fsm_flush import StorageFlushMiddleware
+from bot.middlewares.user_document import UserDocumentMiddleware
+from bot.middlewares.user_logging import UserLogMiddleware
+from bot.storage.bounded_memory import BoundedMemoryStorage
+from client.mongo_client.change_stream import UserChangeStreamWatcher
+from client.mongo_client.fsm_storage import MongoStorage
+from client.registry import clients
 from settings import settings
 
+
+def create_storage() -> BaseStorage:
+    """
+    Creates FSM storage depending on FSM_STORAGE setting.
+    Bounded in-memory storage is used by default for development
+
+    :return: Instance of FSM storage
+    """
+    if settings.fsm_storage == "mongo":
+        return MongoStorage(clients.mongo.db.fsm_states, settings.fsm_state_ttl)
+    return BoundedMemoryStorage(settings.fsm_max_entries, settings.fsm_state_ttl)
+
+
 author_chat_id = settings.author_chat_id  # Chat id of creator for logging
-dp = Dispatcher(storage=MemoryStorage())
+background_tasks: list[asyncio.Task] = []
+
+
+async def start_background_tasks() -> None:
+    """
+    Starts watching the users' collection for changes made outside of this process
+    and following Drive changes feed to keep cached Drive permissions up to date,
+    refreshes Google credentials before they expire, starts access job workers,
+    resumes interrupted broadcasts, reconciles cached Drive permissions
+    and logs metrics of the clients.
+    Registered after the startup hook of the clients, so the clients are ready
+
+    :return: None
+    """
+    background_tasks.extend(
+        [
+            asyncio.create_task(user_change_watcher.run()),
+            asyncio.create_task(clients.drive_sync.run()),
+            asyncio.create_task(clients.access_worker.run()),
+            asyncio.create_task(clients.broadcast_worker.resume()),
+            asyncio.create_task(clients.google.credential_manager.run()),
+            asyncio.create_task(clients.report_metrics(settings.metrics_interval)),
+            asyncio.create_task(
+                clients.async_google.run_permission_reconciliation(
+                    settings.permission_reconcile_interval
+                )
+            ),
+        ]
+    )
+
+
+async def stop_background_tasks() -> None:
+    """
+    Cancels the background tasks and waits for them.
+    Registered before the shutdown hook of the clients,
+    so no task uses the clients after they are closed
+
+    :return: None
+    """
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+
+
+storage = create_storage()
+if isinstance(storage, MongoStorage):
+    # Updates of the same user are processed one by one, so coalesced writes do not race
+    dp = Dispatcher(storage=storage, events_isolation=SimpleEventIsolation())
+    dp.update.outer_middleware(StorageFlushMiddleware(storage))
+    clients.add_startup_step("mongo: fsm storage", storage.setup)
+else:
+    dp = Dispatcher(storage=storage)
+dp.update.outer_middleware(UserDocumentMiddleware(clients.mongo))
+dp.update.outer_middleware(UserLogMiddleware(bot, author_chat_id))
+dp.startup.register(start_logging)
+dp.startup.register(clients.on_startup)
+dp.shutdown.register(stop_background_tasks)
+dp.shutdown.register(clients.on_shutdown)
+# Registered last, so records logged by other shutdown hooks are sent as well
+dp.shutdown.register(stop_logging)
 cancel_router = CancelRouter()
 me_router = MeRouter()
-start_router = RegistrationRouter(bot, mongo_client, author_chat_id)
-delete_router = DeleteRouter(bot, mongo_client, google_client, author_chat_id)
+start_router = RegistrationRouter(bot, clients.mongo, author_chat_id)
+delete_router = DeleteRouter(
+    bot, clients.mongo, clients.async_google, clients.access_jobs, author_chat_id
+)
+broadcast_router = BroadcastRouter(
+    bot, clients.broadcasts, clients.broadcast_worker, author_chat_id
+)
 button_handler_router = ButtonHandlerRouter(
-    bot, mongo_client, google_client, author_chat_id
+    bot, clients.mongo, clients.async_google, clients.access_jobs, author_chat_id
 )
+user_change_watcher = UserChangeStreamWatcher(
+    clients.mongo.users_collection, clients.user_cache, bot, author_chat_id
+)
+dp.startup.register(start_background_tasks)
 
 
 async def main() -> None:
     """
     Includes all routers and start the application.
+    Clients are prepared by the startup hook of the dispatcher,
+    background tasks are started after them and stopped before they are closed.
     Important thing is to import the global routers before state-specific.
     This ensures that when a user enters a global command, it's processed correctly
     regardless of the FSM state they're in
     :return: None
     """
+    # Records logged while the modules were imported are written from here on
+    configure_logging(
+        bot,
+        author_chat_id,
+        log_file=settings.log_file,
+        levels=settings.get_log_levels(),
+        telegram_level=settings.log_telegram_level,
+        file_max_bytes=settings.log_file_max_bytes,
+        file_backup_count=settings.log_file_backup_count,
+    )
     dp.include_routers(
-        cancel_router, me_router, start_router, delete_router, button_handler_router
+        cancel_router,
+        me_router,
+        start_router,
+        delete_router,
+        broadcast_router,
+        button_handler_router,
     )
-
     await dp.start_polling(bot)
 
 
@@ -48,6 +48,39 @@ class Settings(BaseSettings):
     web_content_chat_id: str = Field(None, env="WEB_CONTENT_CHAT_ID")
     mongo_username: str = Field(None, env="MONGO_USERNAME")
     mongo_password: str = Field(None, env="MONGO_PASSWORD")
+    user_cache_size: int = Field(1024, env="USER_CACHE_SIZE")
+    user_cache_ttl: int = Field(300, env="USER_CACHE_TTL")
+    metrics_interval: int = Field(3600, env="METRICS_INTERVAL")
+    fsm_storage: str = Field("memory", env="FSM_STORAGE")
+    fsm_state_ttl: int = Field(86400, env="FSM_STATE_TTL")
+    fsm_max_entries: int = Field(10000, env="FSM_MAX_ENTRIES")
+    google_max_workers: int = Field(4, env="GOOGLE_MAX_WORKERS")
+    google_batch_concurrency: int = Field(4, env="GOOGLE_BATCH_CONCURRENCY")
+    google_batch_max_retries: int = Field(5, env="GOOGLE_BATCH_MAX_RETRIES")
+    google_drive_qps: float = Field(10, env="GOOGLE_DRIVE_QPS")
+    google_drive_burst: float = Field(100, env="GOOGLE_DRIVE_BURST")
+    google_sheets_qps: float = Field(1, env="GOOGLE_SHEETS_QPS")
+    google_sheets_burst: float = Field(10, env="GOOGLE_SHEETS_BURST")
+    google_token_refresh_margin: int = Field(300, env="GOOGLE_TOKEN_REFRESH_MARGIN")
+    access_job_workers: int = Field(4, env="ACCESS_JOB_WORKERS")
+    access_job_max_attempts: int = Field(5, env="ACCESS_JOB_MAX_ATTEMPTS")
+    clean_excluded_sheets: str = Field(
+        "Tasks,Косяки,инфа об авторах", env="CLEAN_EXCLUDED_SHEETS"
+    )
+    permission_reconcile_interval: int = Field(
+        3600, env="PERMISSION_RECONCILE_INTERVAL"
+    )
+    drive_sync_interval: int = Field(60, env="DRIVE_SYNC_INTERVAL")
+    broadcast_concurrency: int = Field(10, env="BROADCAST_CONCURRENCY")
+    telegram_global_rate: float = Field(30, env="TELEGRAM_GLOBAL_RATE")
+    telegram_chat_interval: float = Field(1, env="TELEGRAM_CHAT_INTERVAL")
+    telegram_group_interval: float = Field(3, env="TELEGRAM_GROUP_INTERVAL")
+    telegram_max_retries: int = Field(3, env="TELEGRAM_MAX_RETRIES")
+    log_levels: str = Field("", env="LOG_LEVELS")
+    log_telegram_level: str = Field("INFO", env="LOG_TELEGRAM_LEVEL")
+    log_file: str = Field("logs/bot.jsonl", env="LOG_FILE")
+    log_file_max_bytes: int = Field(10 * 1024 * 1024, env="LOG_FILE_MAX_BYTES")
+    log_file_backup_count: int = Field(5, env="LOG_FILE_BACKUP_COUNT")
 
     def get_bot_token(self):
         if self.tier == "production":
@@ -59,6 +92,29 @@ class Settings(BaseSettings):
                 f"Invalid environment type {self.env_type}"
             )
 
+    def get_clean_excluded_sheets(self) -> tuple[str, ...]:
+        """
+        Returns names of sheets that are not cleaned
+
+        :return: Names from comma-separated CLEAN_EXCLUDED_SHEETS
+        """
+        names = (name.strip() for name in self.clean_excluded_sheets.split(","))
+        return tuple(name for name in names if name)
+
+    def get_log_levels(self) -> dict[str, str]:
+        """
+        Returns levels of loggers set in settings
+
+        :return: Mapping of logger name to level from comma-separated
+            name=LEVEL pairs of LOG_LEVELS
+        """
+        levels = {}
+        for pair in self.log_levels.split(","):
+            name, separator, level = pair.partition("=")
+            if separator and name.strip() and level.strip():
+                levels[name.strip()] = level.strip().upper()
+        return levels
+
     @staticmethod
     def get_table_link(table: str) -> str:
         """
@@ -3,28 +3,26 @@ from logging import Logger
 
 from aiogram import Bot
 
-from bot.bot_logging.admin_logging import BotAdminLoggingHandler
+from bot.bot_logging.logging_config import attach_logger
 
 
 def setup_logger(
     logger: Logger, bot: Bot, log_chat_id: str, validation_level: int = logging.INFO
 ) -> None:
     """
-    Set up an instance of logger class
+    Set up an instance of logger class.
+    All loggers share one queue handler, records are formatted and sent
+    to the admin chat and log file by the background listener
+    started with configure_logging
 
     :param logger: Instance of Logger
     :param bot: Telegram bot
     :param log_chat_id: Chat ID to send logging messages
     :param validation_level: Logging level (e.g., logging.INFO, logging.DEBUG).
+        LOG_LEVELS setting overrides it
     :return: None
     """
-    handler = BotAdminLoggingHandler(bot, log_chat_id)
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%y-%m-%d"
-    )
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
-    logger.setLevel(validation_level)
+    attach_logger(logger, validation_level)
 
 
 def singleton(cls):